@@ -0,0 +1,250 @@
+"""Send chat requests as an offline batch job instead of one call per request.
+
+Requests are written to a JSONL file in the format of the OpenAI batch API,
+submitted through a batch backend and polled until the job has finished. The
+job id is kept in the repository, so a run that is interrupted while waiting
+picks up the same job instead of submitting the requests again.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+import config as cfg
+import http_transport
+import tracing
+from concurrency import locked_cache, map_ordered
+from repository import fingerprint_file
+
+FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def write_requests(path, requests, deployment, temperature=0.0):
+    """Write {custom_id: LangChain messages} as chat completion requests to a JSONL file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, messages in requests.items():
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": deployment,
+                    "temperature": temperature,
+                    "messages": [
+                        {"role": _ROLES[message.type], "content": message.content} for message in messages
+                    ],
+                },
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+
+def read_results(path):
+    """Return {custom_id: (content, usage)} of the successful requests in a batch output file."""
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                continue
+            body = response.get("body") or {}
+            choices = body.get("choices") or [{}]
+            content = (choices[0].get("message") or {}).get("content")
+            if content:
+                results[result["custom_id"]] = (content, body.get("usage") or {})
+    return results
+
+
+def run_batch(repository, stage, requests, *, deployment=None, temperature=0.0, backend=None,
+              poll_interval=None, timeout=None):
+    """Run chat requests as one batch job and return {custom_id: response text}.
+
+    Requests that failed or are missing from the job's output are left out of
+    the result; callers send them again through the synchronous client.
+    """
+    if not requests:
+        return {}
+    backend = backend or get_batch_backend()
+    deployment = deployment or cfg.batch_deployment
+    input_file = repository.get_batch_file(stage, "input")
+    write_requests(input_file, requests, deployment, temperature)
+
+    job = repository.read_batch_job(stage)
+    input_fingerprint = fingerprint_file(input_file)
+    if job is None or job["backend"] != backend.name or job["input"] != input_fingerprint:
+        job = {"backend": backend.name, "id": backend.submit(input_file), "input": input_fingerprint}
+        repository.save_batch_job(stage, job)
+        print(f"Submitted {len(requests)} requests as batch job {job['id']}")
+    else:
+        print(f"Waiting for batch job {job['id']} submitted by an earlier run")
+
+    started = time.perf_counter()
+    status = wait_for_job(
+        backend, job["id"],
+        poll_interval=cfg.batch_poll_interval if poll_interval is None else poll_interval,
+        timeout=cfg.batch_timeout if timeout is None else timeout,
+    )
+    output_file = repository.get_batch_file(stage, "output")
+    results = read_results(output_file) if backend.download(job["id"], output_file) else {}
+    tracing.record_call(
+        f"batch:{deployment}",
+        time.perf_counter() - started,
+        prompt_tokens=sum(usage.get("prompt_tokens", 0) for _, usage in results.values()),
+        completion_tokens=sum(usage.get("completion_tokens", 0) for _, usage in results.values()),
+        failed=status != "completed",
+    )
+    if len(results) < len(requests):
+        print(f"Batch job {job['id']} {status} with {len(requests) - len(results)} of {len(requests)} requests unanswered")
+    repository.clear_batch_job(stage)
+    return {custom_id: content for custom_id, (content, _) in results.items()}
+
+
+def wait_for_job(backend, job_id, poll_interval=60, timeout=86400):
+    """Poll a batch job until it has finished and return its final status."""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = backend.status(job_id)
+        if status in FINISHED_STATUSES:
+            return status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Batch job {job_id} is still {status} after {timeout}s; rerun to keep waiting")
+        time.sleep(min(poll_interval, remaining))
+
+
+class LocalBatchBackend:
+    """File-based stand-in for a batch endpoint, for tests and offline benchmarks.
+
+    Submitted files are copied into folder and answered with the synchronous
+    chat model on the first status poll, writing an output file in the format
+    of the OpenAI batch API.
+    """
+
+    name = "local"
+
+    def __init__(self, folder, chat_model=None, max_workers=4):
+        self.folder = folder
+        self.chat_model = chat_model
+        self.max_workers = max_workers
+        os.makedirs(folder, exist_ok=True)
+
+    def submit(self, input_file):
+        job_id = f"batch_{uuid.uuid4().hex}"
+        shutil.copyfile(input_file, self._file(job_id, "input"))
+        self._write_status(job_id, "in_progress")
+        return job_id
+
+    def status(self, job_id):
+        with open(self._file(job_id, "status"), "r", encoding="utf-8") as f:
+            status = f.read().strip()
+        if status == "in_progress":
+            self._process(job_id)
+            status = "completed"
+            self._write_status(job_id, status)
+        return status
+
+    def download(self, job_id, output_file):
+        if not os.path.exists(self._file(job_id, "output")):
+            return False
+        shutil.copyfile(self._file(job_id, "output"), output_file)
+        return True
+
+    def _process(self, job_id):
+        with open(self._file(job_id, "input"), "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        results = map_ordered(self._answer, requests, self.max_workers)
+        with open(self._file(job_id, "output"), "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def _answer(self, request):
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+        message_types = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        body = request["body"]
+        messages = [message_types[message["role"]](content=message["content"]) for message in body["messages"]]
+        chat_model = self.chat_model
+        if chat_model is None:
+            from llm import get_chat_model
+
+            chat_model = get_chat_model(deployment=body["model"], temperature=body.get("temperature", 0.0))
+        try:
+            response = chat_model.invoke(messages)
+        except Exception as e:
+            return {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+        usage = getattr(response, "usage_metadata", None) or {}
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [{"message": {"role": "assistant", "content": response.content}}],
+                    "usage": {
+                        "prompt_tokens": usage.get("input_tokens", 0),
+                        "completion_tokens": usage.get("output_tokens", 0),
+                    },
+                },
+            },
+            "error": None,
+        }
+
+    def _write_status(self, job_id, status):
+        with open(self._file(job_id, "status"), "w", encoding="utf-8") as f:
+            f.write(status)
+
+    def _file(self, job_id, kind):
+        return os.path.join(self.folder, f"{job_id}.{kind}.jsonl" if kind != "status" else f"{job_id}.status")
+
+
+class AzureOpenAIBatchBackend:
+    """Batch backend for Azure OpenAI global batch deployments."""
+
+    name = "azure"
+
+    def submit(self, input_file):
+        client = _get_openai_client()
+        with open(input_file, "rb") as f:
+            uploaded_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded_file.id, endpoint="/chat/completions", completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, job_id):
+        return _get_openai_client().batches.retrieve(job_id).status
+
+    def download(self, job_id, output_file):
+        client = _get_openai_client()
+        batch = client.batches.retrieve(job_id)
+        if not batch.output_file_id:
+            return False
+        content = client.files.content(batch.output_file_id)
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(content.text)
+        return True
+
+
+@locked_cache
+def get_batch_backend():
+    """Return the batch backend configured by [Batch] backend."""
+    if cfg.batch_backend == "local":
+        return LocalBatchBackend(cfg.batch_local_folder)
+    if cfg.batch_backend == "azure":
+        return AzureOpenAIBatchBackend()
+    raise ValueError(f"Unknown batch backend: {cfg.batch_backend}")
+
+
+@locked_cache
+def _get_openai_client():
+    from openai import AzureOpenAI
+
+    return AzureOpenAI(
+        api_key=cfg.azure_openai_api_key,
+        api_version=cfg.azure_openai_version,
+        azure_endpoint=cfg.azure_openai_endpoint,
+        http_client=http_transport.get_http_client(),
+    )
@@ -0,0 +1,109 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+
+
+def expand_inputs(args):
+    """Expand script ids, folders and glob patterns into input folders."""
+    from main import resolve_input_path
+
+    input_paths = []
+    for arg in args:
+        matches = sorted(glob.glob(arg)) if glob.has_magic(arg) else [resolve_input_path(arg)]
+        for match in matches:
+            if os.path.isdir(match) and match not in input_paths:
+                input_paths.append(match)
+    return input_paths
+
+
+def _init_worker(request_slots, shared_rate_limits):
+    import llm
+    llm.set_request_slots(request_slots)
+    llm.set_shared_rate_limits(shared_rate_limits)
+
+
+def _run_lecture(input_path):
+    """Run the pipeline for one lecture, logging its output to output/<id>/pipeline.log."""
+    from main import run_pipeline
+
+    timings = {}
+    result = {"input": input_path, "timings": timings, "error": None}
+    log_folder = os.path.join("output", os.path.basename(input_path))
+    os.makedirs(log_folder, exist_ok=True)
+    started = time.perf_counter()
+    with open(os.path.join(log_folder, "pipeline.log"), "w", encoding="utf-8") as log_file:
+        with redirect_stdout(log_file), redirect_stderr(log_file):
+            try:
+                run_pipeline(input_path, timings)
+            except BaseException as e:
+                traceback.print_exc()
+                result["error"] = f"{type(e).__name__}: {e}"
+    result["total"] = time.perf_counter() - started
+    return result
+
+
+def print_summary(results, stage_names):
+    header = ["lecture"] + stage_names + ["total", "status"]
+    rows = []
+    for result in results:
+        timings = result["timings"]
+        rows.append(
+            [os.path.basename(result["input"])]
+            + [f"{timings[stage]:.1f}s" if stage in timings else "-" for stage in stage_names]
+            + [f"{result['total']:.1f}s", "ok" if result["error"] is None else "FAILED"]
+        )
+    widths = [max(len(row[idx]) for row in [header] + rows) for idx in range(len(header))]
+    print()
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+    for result in results:
+        if result["error"] is not None:
+            print(f"\n{os.path.basename(result['input'])} failed: {result['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the script generation pipeline for many lectures.")
+    parser.add_argument("inputs", nargs="+", help="script numbers, input folders or glob patterns like 'input/*'")
+    parser.add_argument("--workers", type=int, default=4, help="number of lectures processed in parallel")
+    parser.add_argument(
+        "--max-llm-requests", type=int, default=8,
+        help="maximum number of concurrent model requests across all lectures",
+    )
+    args = parser.parse_args()
+
+    input_paths = expand_inputs(args.inputs)
+    if not input_paths:
+        print("No input folders found.")
+        sys.exit(1)
+
+    import llm
+    from main import PIPELINE
+    stage_names = [stage.name for stage in PIPELINE]
+
+    print(f"Processing {len(input_paths)} lectures with {args.workers} workers")
+    request_slots = multiprocessing.BoundedSemaphore(args.max_llm_requests)
+    results = []
+    # All workers draw from the same rate limit budgets, so the last lecture
+    # still running can use the whole budget
+    shared_rate_limits = llm.create_shared_rate_limits()
+    with ProcessPoolExecutor(
+        max_workers=min(args.workers, len(input_paths)),
+        initializer=_init_worker,
+        initargs=(request_slots, shared_rate_limits),
+    ) as executor:
+        futures = {executor.submit(_run_lecture, input_path): input_path for input_path in input_paths}
+        for future in as_completed(futures):
+            result = future.result()
+            status = "done" if result["error"] is None else "FAILED"
+            print(f"{os.path.basename(result['input'])}: {status} after {result['total']:.1f}s")
+            results.append(result)
+
+    results.sort(key=lambda result: input_paths.index(result["input"]))
+    print_summary(results, stage_names)
+    sys.exit(1 if any(result["error"] is not None for result in results) else 0)
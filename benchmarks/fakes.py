@@ -0,0 +1,294 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+
+class FakeRateLimitError(Exception):
+    """Error raised by the fakes to simulate a 429 response of the service."""
+
+    status_code = 429
+
+    def __init__(self, retry_after_ms):
+        super().__init__("Simulated rate limit")
+        self.response = type("Response", (), {"headers": {"retry-after-ms": str(retry_after_ms)}})()
+
+
+class FakeService:
+    """Deterministic latency and failure injection shared by all fakes.
+
+    Every request sleeps for latency seconds plus up to jitter seconds and
+    fails with a FakeRateLimitError with probability failure_rate. The random
+    sequence is seeded, so two runs with the same settings behave alike.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, retry_after_ms=100, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.retry_after_ms = retry_after_ms
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.random() * self.jitter
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise FakeRateLimitError(self.retry_after_ms)
+
+
+class FakeChatModel(FakeService):
+    """Stand-in for the chat model used by lectoring and slide interpretation.
+
+    Lectoring requests are answered with the paragraphs of their CURRENT
+    section, vision requests with a description derived from the image, or
+    with JSON holding one description per image if they contain several.
+    """
+
+    def invoke(self, messages):
+        self.request()
+        content = messages[-1].content
+        if isinstance(content, list):
+            image_urls = [item["image_url"]["url"] for item in content if item.get("type") == "image_url"]
+            descriptions = [f"Slide about topic {_digest(url)[:8]}: {_words(_digest(url), 40)}" for url in image_urls]
+            if len(descriptions) > 1:
+                text = json.dumps({"slides": [
+                    {"slide": number, "description": description}
+                    for number, description in enumerate(descriptions, start=1)
+                ]})
+            else:
+                text = " ".join(descriptions)
+        else:
+            current = content.split("CURRENT:\n", 1)[-1]
+            text = "\n\n".join(line.strip() for line in current.split("\n") if line.strip())
+        prompt_tokens = sum(len(str(message.content)) for message in messages) // 4
+        completion_tokens = len(text) // 4
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+
+class FakeEmbeddings(FakeService):
+    """Stand-in for the embeddings model returning seeded unit vectors per text."""
+
+    def __init__(self, dimensions=1536, **kwargs):
+        super().__init__(**kwargs)
+        self.dimensions = dimensions
+
+    def embed_query(self, text):
+        self.request()
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        self.request()
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text):
+        generator = np.random.default_rng(int(_digest(text)[:16], 16))
+        vector = generator.standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeSearchResults(list):
+
+    def __init__(self, results, count):
+        super().__init__(results)
+        self._count = count
+
+    def get_count(self):
+        return self._count
+
+
+class FakeSearchClient(FakeService):
+    """In-memory stand-in for the Azure Search client of the script index.
+
+    Supports the calls the pipeline makes: document lookups, filtered and
+    vector queries, and uploads through FakeBufferedSender. Injected rate
+    limit errors are retried inside the client, like the SDK's retry policy.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.documents = {}
+
+    def request(self):
+        while True:
+            try:
+                return super().request()
+            except FakeRateLimitError:
+                time.sleep(self.retry_after_ms / 1000.0)
+
+    def get_document(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        self.request()
+        if key not in self.documents:
+            raise ResourceNotFoundError(f"Document {key} not found")
+        return self.documents[key]
+
+    def search(self, search_text=None, vector_queries=None, filter=None, select=None, top=None,
+               include_total_count=False, **kwargs):
+        self.request()
+        with self._lock:
+            documents = [document for document in self.documents.values() if _matches_filter(document, filter)]
+        if vector_queries:
+            documents = self._nearest(documents, vector_queries[0])
+        else:
+            documents = [dict(document, **{"@search.score": 1.0}) for document in documents]
+        count = len(documents)
+        if top is not None:
+            documents = documents[:top]
+        if select:
+            documents = [
+                {field: document[field] for field in [*select, "@search.score"] if field in document}
+                for document in documents
+            ]
+        return FakeSearchResults(documents, count if include_total_count else None)
+
+    def index_documents(self, upload=(), delete=()):
+        self.request()
+        with self._lock:
+            for document in upload:
+                self.documents[document["vector_id"]] = document
+            for document in delete:
+                self.documents.pop(document["vector_id"], None)
+
+    def _nearest(self, documents, vector_query):
+        if not documents:
+            return []
+        query = np.asarray(vector_query.vector, dtype=np.float32)
+        vectors = np.asarray([document["content_vector"] for document in documents], dtype=np.float32)
+        similarities = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+        nearest = np.argsort(-similarities, kind="stable")[:vector_query.k_nearest_neighbors]
+        return [dict(documents[idx], **{"@search.score": float(1.0 / (2.0 - similarities[idx]))}) for idx in nearest]
+
+
+class FakeBufferedSender:
+    """Stand-in for SearchIndexingBufferedSender that uploads in batches to a FakeSearchClient."""
+
+    def __init__(self, search_client, initial_batch_action_count=512, on_error=None, **kwargs):
+        self.search_client = search_client
+        self.batch_size = initial_batch_action_count
+        self.on_error = on_error
+        self._uploads = []
+        self._deletes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def merge_or_upload_documents(self, documents):
+        self._uploads.extend(documents)
+        self._flush_full_batches()
+
+    def delete_documents(self, documents):
+        self._deletes.extend(documents)
+        self._flush_full_batches()
+
+    def flush(self):
+        while self._uploads or self._deletes:
+            self._send_batch()
+
+    def _flush_full_batches(self):
+        while len(self._uploads) + len(self._deletes) >= self.batch_size:
+            self._send_batch()
+
+    def _send_batch(self):
+        deletes, self._deletes = self._deletes[:self.batch_size], self._deletes[self.batch_size:]
+        uploads = self._uploads[:self.batch_size - len(deletes)]
+        self._uploads = self._uploads[len(uploads):]
+        self.search_client.index_documents(upload=uploads, delete=deletes)
+
+
+class FakeIndexClient:
+    """Stand-in for the SearchIndexClient managing the script index."""
+
+    def __init__(self, search_client):
+        self.search_client = search_client
+        self.index = None
+
+    def get_index(self, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        if self.index is None:
+            raise ResourceNotFoundError(f"Index {name} not found")
+        return self.index
+
+    def create_or_update_index(self, index):
+        self.index = index
+        return index
+
+    def delete_index(self, name):
+        self.index = None
+        self.search_client.documents.clear()
+
+
+def _matches_filter(document, odata_filter):
+    if not odata_filter:
+        return True
+    match = re.fullmatch(r"(\w+) eq '((?:[^']|'')*)'", odata_filter.strip())
+    if match is None:
+        raise ValueError(f"Unsupported filter: {odata_filter}")
+    return str(document.get(match.group(1))) == match.group(2).replace("''", "'")
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _words(seed, count):
+    generator = random.Random(seed)
+    return " ".join(generator.choice(_VOCABULARY) for _ in range(count))
+
+
+_VOCABULARY = (
+    "Daten Modell Prozess System Analyse Beispiel Methode Ergebnis Struktur Funktion Wert Menge "
+    "Algorithmus Schicht Netzwerk Speicher Anfrage Antwort Index Vektor Matrix Graph Knoten Kante"
+).split()
+
+
+def count_pdf_pages(pdf_path):
+    """Return the page count of a PDF written by benchmarks.inputs.write_slides_pdf."""
+    with open(pdf_path, "rb") as pdf:
+        return int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf.read()).group(1))
+
+
+def render_pages(pdf_path, page_range, slide_files, dpi):
+    """Stand-in for slide_extractor._render_pages on machines without Poppler.
+
+    Draws a slide-sized image per page with its page number and a few seeded
+    boxes instead of rasterizing the PDF.
+    """
+    import os
+    from PIL import Image, ImageDraw
+
+    width, height = 960 * dpi // 72, 540 * dpi // 72
+    for page_number, slide_file in zip(page_range, slide_files):
+        generator = random.Random(page_number)
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        draw.text((width // 16, height // 12), f"Slide {page_number}", fill="black")
+        for _ in range(generator.randint(1, 4)):
+            x, y = generator.randrange(width // 2), generator.randrange(height // 2)
+            draw.rectangle((x, y, x + width // 4, y + height // 4), fill=tuple(generator.randrange(256) for _ in range(3)))
+        temporary_file = f"{slide_file}.tmp"
+        image.save(temporary_file, "PNG")
+        os.replace(temporary_file, slide_file)
+    return slide_files
@@ -0,0 +1,74 @@
+import random
+
+from docx import Document
+
+_VOCABULARY = (
+    "also wir schauen uns heute die Daten und das Modell an dann kommt der Prozess mit seinem System "
+    "eine Analyse zeigt am Beispiel welche Methode zum Ergebnis führt die Struktur und Funktion jeder "
+    "Schicht im Netzwerk bestimmt wie Speicher und Index zusammenarbeiten genau so ist das gemeint"
+).split()
+
+
+def write_transcript(path, paragraphs=2000, min_words=20, max_words=120, seed=0):
+    """Write a transcript .docx with timestamped paragraphs of random spoken-style text."""
+    generator = random.Random(seed)
+    document = Document()
+    for idx in range(paragraphs):
+        minutes, seconds = divmod(idx * 7, 60)
+        words = " ".join(generator.choice(_VOCABULARY) for _ in range(generator.randint(min_words, max_words)))
+        document.add_paragraph(f"{minutes:02d}:{seconds:02d} {words}")
+    document.save(path)
+
+
+def write_slides_pdf(path, pages=300, seed=0):
+    """Write a landscape PDF with a title, bullet points and a few boxes on every page.
+
+    The file is written page by page with plain PDF drawing operators, so
+    decks with hundreds of pages are produced quickly and in constant memory.
+    """
+    generator = random.Random(seed)
+    offsets = []
+
+    with open(path, "wb") as pdf:
+        def write_object(number, body):
+            offsets.append((number, pdf.tell()))
+            pdf.write(f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+
+        pdf.write(b"%PDF-1.4\n")
+        # Objects 1-3 are the catalog, the page tree and the font, pages start at 4
+        page_numbers = [4 + 2 * idx for idx in range(pages)]
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{number} 0 R" for number in page_numbers)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("latin-1"))
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for page_idx, page_number in enumerate(page_numbers):
+            content = _slide_content(page_idx + 1, generator)
+            write_object(page_number, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 960 540] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_number + 1} 0 R >>"
+            ).encode("latin-1"))
+            write_object(page_number + 1, f"<< /Length {len(content)} >>\nstream\n".encode("latin-1")
+                         + content + b"\nendstream")
+
+        xref_offset = pdf.tell()
+        object_count = 3 + 2 * pages
+        pdf.write(f"xref\n0 {object_count + 1}\n0000000000 65535 f \n".encode("latin-1"))
+        for _, offset in sorted(offsets):
+            pdf.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+        pdf.write(f"trailer\n<< /Size {object_count + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+                  .encode("latin-1"))
+
+
+def _slide_content(page_number, generator):
+    lines = [f"BT /F1 32 Tf 60 470 Td (Slide {page_number}: {_phrase(generator, 4)}) Tj ET"]
+    for bullet in range(generator.randint(3, 6)):
+        lines.append(f"BT /F1 20 Tf 80 {400 - bullet * 40} Td (- {_phrase(generator, 8)}) Tj ET")
+    for _ in range(generator.randint(1, 3)):
+        gray = generator.random()
+        x, y = generator.randint(600, 820), generator.randint(60, 360)
+        lines.append(f"{gray:.2f} g {x} {y} {generator.randint(40, 120)} {generator.randint(40, 120)} re f 0 g")
+    return "\n".join(lines).encode("latin-1")
+
+
+def _phrase(generator, words):
+    return " ".join(generator.choice(_VOCABULARY) for _ in range(words)).replace("ü", "ue")
@@ -0,0 +1,356 @@
+"""Run the pipeline offline against local stand-ins for Azure OpenAI and Azure Search.
+
+Synthetic inputs are generated in a temporary working directory together
+with a dummy config.properties, so the benchmark runs on any machine without
+credentials. Example:
+
+    python -m benchmarks.run --paragraphs 2000 --pages 300 --chat-latency 0.5
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPOSITORY_ROOT not in sys.path:
+    sys.path.insert(0, REPOSITORY_ROOT)
+
+from benchmarks import fakes, inputs
+
+SCRIPT_ID = "99"
+
+CONFIG_TEMPLATE = """[AzureOpenAI]
+azure_openai_api_key = benchmark
+azure_openai_version = 2024-06-01
+azure_openai_endpoint = https://benchmark.invalid/
+
+[AzureSearch]
+search_api_key = benchmark
+search_api_endpoint = https://benchmark.invalid/
+index_name = benchmark
+
+[Matching]
+backend = {backend}
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline with local stand-ins for all services.")
+    parser.add_argument("--paragraphs", type=int, default=2000, help="transcript paragraphs to generate")
+    parser.add_argument("--pages", type=int, default=300, help="slide deck pages to generate")
+    parser.add_argument("--backend", choices=["azure", "local"], default="azure",
+                        help="matching backend; azure uses the fake search client")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="seconds per chat request")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per embeddings request")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="seconds per search request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="share of requests failing with a simulated rate limit error")
+    parser.add_argument("--renderer", choices=["auto", "poppler", "fake"], default="auto",
+                        help="render slides with Poppler, or draw stand-in images (auto: Poppler if installed)")
+    parser.add_argument("--parallel-stages", type=int,
+                        help="stages run concurrently (default: [Pipeline] max_parallel_stages)")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="number of pipeline runs; later runs measure incremental rebuilds")
+    parser.add_argument("--config", action="append", default=[], metavar="SECTION.OPTION=VALUE",
+                        help="extra config.properties setting, may be repeated")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--workdir", help="working directory to use instead of a temporary one")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def write_config(backend, settings):
+    sections = {}
+    for setting in settings:
+        option, value = setting.split("=", 1)
+        section, option = option.rsplit(".", 1)
+        sections.setdefault(section, []).append(f"{option} = {value}")
+    with open("config.properties", "w", encoding="utf-8") as f:
+        f.write(CONFIG_TEMPLATE.format(backend=backend))
+        for section, lines in sections.items():
+            f.write(f"\n[{section}]\n" + "\n".join(lines) + "\n")
+
+
+def generate_inputs(args):
+    input_folder = os.path.join("input", SCRIPT_ID)
+    os.makedirs(input_folder, exist_ok=True)
+    started = time.perf_counter()
+    inputs.write_transcript(os.path.join(input_folder, f"{SCRIPT_ID}_benchmark.docx"), args.paragraphs, seed=args.seed)
+    inputs.write_slides_pdf(os.path.join(input_folder, f"{SCRIPT_ID}_benchmark.pdf"), args.pages, seed=args.seed)
+    print(f"Generated {args.paragraphs} paragraphs and {args.pages} pages in {time.perf_counter() - started:.1f}s")
+    return input_folder
+
+
+def install_fakes(args):
+    """Replace the clients of Azure OpenAI and Azure Search with fakes."""
+    import llm
+
+    services = {
+        "chat": fakes.FakeChatModel(latency=args.chat_latency, jitter=args.jitter,
+                                    failure_rate=args.failure_rate, seed=args.seed),
+        "embeddings": fakes.FakeEmbeddings(latency=args.embedding_latency, jitter=args.jitter,
+                                           failure_rate=args.failure_rate, seed=args.seed + 1),
+        "search": fakes.FakeSearchClient(latency=args.search_latency, jitter=args.jitter,
+                                         failure_rate=args.failure_rate, seed=args.seed + 2),
+    }
+    # The fakes replace the LangChain clients, so rate limiting, retries,
+    # caching and tracing in llm.py are part of the measurement
+    llm._create_chat_client = lambda deployment, temperature: services["chat"]
+    llm._create_embeddings_client = lambda deployment: services["embeddings"]
+
+    import matching.init_azure_search as index_mgmt
+    import matching.script_search as script_search
+
+    index_client = fakes.FakeIndexClient(services["search"])
+    index_mgmt.get_index_client = lambda: index_client
+    script_search.get_search_client = lambda: services["search"]
+    script_search.SearchIndexingBufferedSender = (
+        lambda endpoint, index_name, credential, **kwargs: fakes.FakeBufferedSender(services["search"], **kwargs)
+    )
+
+    import interpreting.slide_extractor as extractor
+
+    if args.renderer == "fake" or (args.renderer == "auto" and shutil.which("pdftoppm") is None):
+        print("Rendering stand-in slide images instead of rasterizing the PDF")
+        extractor.pdfinfo_from_path = lambda pdf_path: {"Pages": fakes.count_pdf_pages(pdf_path)}
+        extractor._render_pages = fakes.render_pages
+    return services
+
+
+def reset_peak_memory():
+    """Reset the peak resident set size of this process where the kernel supports it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is the peak of the whole process lifetime, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def process_tree_memory_mb(pid=None):
+    """Return the resident memory of a process and all its descendants, or None without /proc.
+
+    Slide rendering workers are started by the forkserver, so they are
+    grandchildren of the benchmark and never show up in RUSAGE_CHILDREN.
+    """
+    children = {}
+    try:
+        process_ids = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    for process_id in process_ids:
+        try:
+            with open(f"/proc/{process_id}/stat") as f:
+                # The command name in parentheses may contain spaces
+                parent_id = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent_id, []).append(process_id)
+
+    resident_kb = 0
+    pending = [pid or os.getpid()]
+    while pending:
+        process_id = pending.pop()
+        pending.extend(children.get(process_id, []))
+        try:
+            with open(f"/proc/{process_id}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        resident_kb += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return resident_kb / 1024.0
+
+
+class MemorySampler:
+    """Sample the resident memory of the benchmark and its child processes in the background.
+
+    Records the peak of the whole run and, for every stage, the peak while
+    that stage was running. Stages run concurrently, so a stage's peak
+    includes the memory of the stages overlapping with it.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.stage_peaks_mb = {}
+        self._running_stages = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample_until_stopped, daemon=True)
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        self.sample()
+
+    @contextlib.contextmanager
+    def stage(self, stage_name):
+        with self._lock:
+            self._running_stages.add(stage_name)
+        self.sample()
+        try:
+            yield
+        finally:
+            self.sample()
+            with self._lock:
+                self._running_stages.discard(stage_name)
+
+    def sample(self):
+        memory_mb = process_tree_memory_mb()
+        if memory_mb is None:
+            return
+        with self._lock:
+            self.peak_mb = max(self.peak_mb, memory_mb)
+            for stage_name in self._running_stages:
+                self.stage_peaks_mb[stage_name] = max(self.stage_peaks_mb.get(stage_name, 0.0), memory_mb)
+
+    def _sample_until_stopped(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+
+@contextlib.contextmanager
+def sampled_stages(stages, sampler):
+    """Let the sampler know which stages are running while the pipeline runs."""
+    original_runs = [stage.run for stage in stages]
+
+    def sampled(stage_name, run):
+        def run_stage(repository):
+            with sampler.stage(stage_name):
+                run(repository)
+        return run_stage
+
+    for stage, run in zip(stages, original_runs):
+        stage.run = sampled(stage.name, run)
+    try:
+        yield
+    finally:
+        for stage, run in zip(stages, original_runs):
+            stage.run = run
+
+
+def stage_items(repository):
+    paragraphs = len(repository.read_json_script()["content"])
+    slides = len(repository.read_slide_descriptions())
+    return {"lector": paragraphs, "interpret": slides, "index": paragraphs, "match": slides, "generate": slides}
+
+
+def run_benchmark(args, services):
+    import tracing
+    from main import PIPELINE, run_pipeline
+    from repository import Repository
+
+    input_folder = os.path.join("input", SCRIPT_ID)
+    results = []
+    for run in range(1, args.runs + 1):
+        reset_peak_memory()
+        started = time.perf_counter()
+        with MemorySampler() as sampler, sampled_stages(PIPELINE, sampler):
+            timings = run_pipeline(input_folder, max_parallel_stages=args.parallel_stages)
+        seconds = time.perf_counter() - started
+        trace = tracing.get_trace().to_dict()
+        items = stage_items(Repository(input_folder))
+        calls = {stage["stage"]: stage["calls"] for stage in trace["stages"]}
+        stage_results = []
+        for stage_name, stage_seconds in timings.items():
+            stage_calls = calls.get(stage_name, {}).values()
+            stage_results.append({
+                "stage": stage_name,
+                "seconds": stage_seconds,
+                "items": items[stage_name],
+                "items_per_second": items[stage_name] / max(stage_seconds, 1e-9),
+                "requests": sum(call["requests"] for call in stage_calls),
+                "cache_hits": sum(call["cache_hits"] for call in stage_calls),
+                "peak_memory_mb": sampler.stage_peaks_mb.get(stage_name),
+            })
+        results.append({
+            "run": run,
+            "seconds": seconds,
+            # Sampling can miss short spikes, this process's own peak is exact
+            "peak_memory_mb": max(sampler.peak_mb, peak_memory_mb()),
+            "stages": stage_results,
+            "trace": trace,
+        })
+
+    return {
+        "settings": vars(args),
+        "runs": results,
+        "services": {
+            name: {"requests": service.requests, "injected_failures": service.failures}
+            for name, service in services.items()
+        },
+    }
+
+
+def print_report(report):
+    header = ["run", "stage", "wall", "items", "items/s", "requests", "cached", "peak MB"]
+    rows = []
+    for run in report["runs"]:
+        for stage in run["stages"]:
+            rows.append([
+                str(run["run"]), stage["stage"], f"{stage['seconds']:.2f}s", str(stage["items"]),
+                f"{stage['items_per_second']:.1f}", str(stage["requests"]), str(stage["cache_hits"]),
+                "-" if stage["peak_memory_mb"] is None else f"{stage['peak_memory_mb']:.0f}",
+            ])
+    widths = [max(len(row[idx]) for row in [header] + rows) for idx in range(len(header))]
+    print()
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+    print()
+    for run in report["runs"]:
+        print(f"Run {run['run']}: {run['seconds']:.2f}s end to end, peak memory {run['peak_memory_mb']:.0f} MB")
+    for name, service in report["services"].items():
+        print(f"{name}: {service['requests']} requests, {service['injected_failures']} injected failures")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_file = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="script-generator-benchmark-"))
+    os.makedirs(workdir, exist_ok=True)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        write_config(args.backend, args.config)
+        generate_inputs(args)
+        services = install_fakes(args)
+        report = run_benchmark(args, services)
+        print_report(report)
+        if output_file:
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=4)
+            print(f"Results written to {output_file}")
+    finally:
+        os.chdir(previous_cwd)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def locked_cache(fn):
+    """Cache the results of fn like lru_cache, creating every result only once.
+
+    lru_cache may call fn several times if threads miss the cache at the same
+    time; shared clients, rate limiters and caches must not be created twice,
+    so calls are serialized by a lock of the decorated function.
+    """
+    cached = functools.lru_cache(maxsize=None)(fn)
+    lock = threading.RLock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+def map_ordered(fn, items, max_workers=1):
+    """Apply fn to every item with at most max_workers calls in flight.
+
+    Results are returned in the order of the input items, regardless of the
+    order in which the calls complete. Every call runs in a copy of the
+    caller's context, so context variables such as the current tracing stage
+    are visible to it. With max_workers <= 1 the items are processed
+    sequentially in the calling thread.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    results = [None] * len(items)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        futures = {executor.submit(contextvars.copy_context().run, fn, item): idx for idx, item in enumerate(items)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    return results
@@ -1,17 +1,115 @@
 import configparser
+import threading
 
-# Initialize the parser
-config = configparser.ConfigParser()
+_lock = threading.Lock()
+_loaded = False
 
-# Read the properties file
-config.read('config.properties')
 
-# AzureOpenAI
-azure_openai_api_key = config.get('AzureOpenAI', 'azure_openai_api_key')
-azure_openai_version = config.get('AzureOpenAI', 'azure_openai_version')
-azure_openai_endpoint = config.get('AzureOpenAI', 'azure_openai_endpoint')
+def _load():
+    """Read config.properties into the attributes of this module."""
+    # Initialize the parser
+    config = configparser.ConfigParser()
 
-# AzureSearch
-search_api_endpoint = config.get('AzureSearch', 'search_api_endpoint')
-search_api_key = config.get('AzureSearch', 'search_api_key')
-index_name = config.get('AzureSearch', 'index_name')
\ No newline at end of file
+    # Read the properties file
+    config.read('config.properties')
+
+    # AzureOpenAI
+    azure_openai_api_key = config.get('AzureOpenAI', 'azure_openai_api_key')
+    azure_openai_version = config.get('AzureOpenAI', 'azure_openai_version')
+    azure_openai_endpoint = config.get('AzureOpenAI', 'azure_openai_endpoint')
+
+    # AzureSearch
+    search_api_endpoint = config.get('AzureSearch', 'search_api_endpoint')
+    search_api_key = config.get('AzureSearch', 'search_api_key')
+    index_name = config.get('AzureSearch', 'index_name')
+    search_upload_batch_size = config.getint('AzureSearch', 'upload_batch_size', fallback=500)
+    search_ready_timeout = config.getint('AzureSearch', 'ready_timeout', fallback=120)
+
+    # Matching
+    matching_backend = config.get('Matching', 'backend', fallback='azure')
+    matching_max_concurrency = config.getint('Matching', 'max_concurrency', fallback=8)
+
+    # Embeddings
+    embedding_batch_size = config.getint('Embeddings', 'batch_size', fallback=64)
+    embedding_max_concurrency = config.getint('Embeddings', 'max_concurrency', fallback=4)
+    embedding_cache_enabled = config.getboolean('Embeddings', 'cache_enabled', fallback=True)
+    embedding_cache_path = config.get('Embeddings', 'cache_path', fallback='cache/embeddings.sqlite')
+    embedding_cache_max_mb = config.getint('Embeddings', 'cache_max_mb', fallback=512)
+
+    # Interpreting
+    interpreting_max_concurrency = config.getint('Interpreting', 'max_concurrency', fallback=4)
+    interpreting_slides_per_request = config.getint('Interpreting', 'slides_per_request', fallback=1)
+    interpreting_image_max_edge = config.getint('Interpreting', 'image_max_edge', fallback=2048)
+    interpreting_image_format = config.get('Interpreting', 'image_format', fallback='jpeg')
+    interpreting_image_quality = config.getint('Interpreting', 'image_quality', fallback=85)
+    interpreting_image_detail = config.get('Interpreting', 'image_detail', fallback='auto')
+    interpreting_dedupe = config.getboolean('Interpreting', 'dedupe', fallback=True)
+    interpreting_dedupe_max_distance = config.getint('Interpreting', 'dedupe_max_distance', fallback=8)
+    render_workers = config.getint('Interpreting', 'render_workers', fallback=0)
+    render_pages_per_task = config.getint('Interpreting', 'render_pages_per_task', fallback=4)
+
+    # Lectoring
+    lectoring_parallel = config.getboolean('Lectoring', 'parallel', fallback=False)
+    lectoring_max_workers = config.getint('Lectoring', 'max_workers', fallback=4)
+    lectoring_context_tokens = config.getint('Lectoring', 'context_tokens', fallback=128000)
+    lectoring_output_tokens = config.getint('Lectoring', 'output_tokens', fallback=16384)
+    lectoring_budget_share = config.getfloat('Lectoring', 'budget_share', fallback=0.25)
+
+    # LLM
+    llm_response_cache_enabled = config.getboolean('LLM', 'response_cache_enabled', fallback=False)
+    llm_response_cache_bypass = config.getboolean('LLM', 'response_cache_bypass', fallback=False)
+    llm_response_cache_path = config.get('LLM', 'response_cache_path', fallback='cache/llm_responses.sqlite')
+    llm_response_cache_max_mb = config.getint('LLM', 'response_cache_max_mb', fallback=256)
+    llm_max_retries = config.getint('LLM', 'max_retries', fallback=6)
+    llm_completion_tokens_estimate = config.getint('LLM', 'completion_tokens_estimate', fallback=500)
+    llm_image_tokens_estimate = config.getint('LLM', 'image_tokens_estimate', fallback=765)
+    llm_tokenizer = config.get('LLM', 'tokenizer', fallback='o200k_base')
+
+    # Rate limits per deployment, e.g. [RateLimit:gpt-4o]
+    rate_limits = {
+        section.split(':', 1)[1]: (
+            config.getint(section, 'requests_per_minute', fallback=0),
+            config.getint(section, 'tokens_per_minute', fallback=0),
+        )
+        for section in config.sections()
+        if section.startswith('RateLimit:')
+    }
+
+    # Batch jobs
+    batch_enabled = config.getboolean('Batch', 'enabled', fallback=False)
+    batch_backend = config.get('Batch', 'backend', fallback='azure')
+    batch_deployment = config.get('Batch', 'deployment', fallback='gpt-4o')
+    batch_poll_interval = config.getint('Batch', 'poll_interval', fallback=60)
+    batch_timeout = config.getint('Batch', 'timeout', fallback=86400)
+    batch_local_folder = config.get('Batch', 'local_folder', fallback='cache/batch_jobs')
+
+    # HTTP connection pools shared by all Azure clients
+    http_pool_size = config.getint('HTTP', 'pool_size', fallback=64)
+    http_connect_timeout = config.getfloat('HTTP', 'connect_timeout', fallback=10.0)
+    http_read_timeout = config.getfloat('HTTP', 'read_timeout', fallback=120.0)
+    http_keepalive_seconds = config.getfloat('HTTP', 'keepalive_seconds', fallback=60.0)
+
+    # Pipeline
+    pipeline_max_parallel_stages = config.getint('Pipeline', 'max_parallel_stages', fallback=2)
+
+    # Generation
+    slide_alignment = config.get('Generation', 'alignment', fallback='global')
+
+    globals().update(
+        (name, value) for name, value in locals().items() if name != "config"
+    )
+
+
+def __getattr__(name):
+    # config.properties is read on first access, so importing a module that
+    # uses the configuration does not require the file to exist
+    global _loaded
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if not _loaded:
+            _load()
+            _loaded = True
+    if name in globals():
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
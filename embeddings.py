@@ -1,6 +1,91 @@
-from llm import get_embedding_model
+import config as cfg
+import tracing
+from array import array
+from concurrency import locked_cache, map_ordered
+from disk_cache import DiskCache, make_key
+from llm import DEFAULT_EMBEDDING_DEPLOYMENT, get_embedding_model
+from tqdm import tqdm
 
-_embedding_model = get_embedding_model()
+_deployment = DEFAULT_EMBEDDING_DEPLOYMENT
+
+def _embedding_model():
+    return get_embedding_model(deployment=_deployment)
+
+@locked_cache
+def _get_cache():
+    if not cfg.embedding_cache_enabled:
+        return None
+    return DiskCache(cfg.embedding_cache_path, cfg.embedding_cache_max_mb * 1024 * 1024)
 
 def generate_embeddings(text):
-    return _embedding_model.embed_query(text)
\ No newline at end of file
+    cache = _get_cache()
+    if cache is None:
+        return _embedding_model().embed_query(text)
+
+    key = _cache_key(text)
+    cached = cache.get(key)
+    if cached is not None:
+        tracing.record_cache_hits(f"embeddings:{_deployment}")
+        return _decode(cached)
+    vector = _embedding_model().embed_query(text)
+    cache.set(key, _encode(vector))
+    return vector
+
+def generate_embeddings_batch(texts, batch_size=None, max_concurrency=None):
+    """Embed many texts with one request per batch, keeping the input order.
+
+    Texts already present in the embedding cache are not sent to the model.
+    """
+    texts = list(texts)
+    cache = _get_cache()
+    if cache is None:
+        return _embed_batches(texts, batch_size, max_concurrency)
+
+    keys = [_cache_key(text) for text in texts]
+    cached = {key: _decode(value) for key, value in cache.get_many(keys).items()}
+    missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+    print(f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} texts cached")
+    tracing.record_cache_hits(f"embeddings:{_deployment}", len(texts) - len(missing))
+
+    if missing:
+        vectors = _embed_batches(list(missing.values()), batch_size, max_concurrency)
+        computed = dict(zip(missing.keys(), vectors))
+        cache.set_many({key: _encode(vector) for key, vector in computed.items()})
+        cached.update(computed)
+
+    return [cached[key] for key in keys]
+
+def get_cache_stats():
+    """Return the hit, miss and eviction counters of the embedding cache, or None if it was not used."""
+    if not _get_cache.cache_info().currsize:
+        return None
+    cache = _get_cache()
+    return cache.stats() if cache is not None else None
+
+def _embed_batches(texts, batch_size, max_concurrency):
+    batch_size = batch_size or cfg.embedding_batch_size
+    max_concurrency = max_concurrency or cfg.embedding_max_concurrency
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+    progress_bar = tqdm(total=len(texts), desc="Generating embeddings")
+
+    def embed_batch(batch):
+        vectors = _embedding_model().embed_documents(batch)
+        progress_bar.update(len(batch))
+        return vectors
+
+    try:
+        results = map_ordered(embed_batch, batches, max_concurrency)
+    finally:
+        progress_bar.close()
+
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+def _cache_key(text):
+    return make_key(_deployment, text)
+
+def _encode(vector):
+    return array('d', vector).tobytes()
+
+def _decode(value):
+    return array('d', value).tolist()
@@ -0,0 +1,65 @@
+"""Shared HTTP connection pools for the Azure OpenAI and Azure Search clients.
+
+All model clients use one httpx client and all search clients one requests
+session, so connections (and their TLS handshakes) are kept alive and reused
+across clients, stages and threads. Pool size, timeouts and keep-alive are
+configured in the [HTTP] section of config.properties.
+"""
+import config as cfg
+from concurrency import locked_cache
+
+
+def create_http_client(pool_size, connect_timeout, read_timeout, keepalive_seconds):
+    """Return an httpx client with a pool of pool_size kept-alive connections."""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+    )
+
+
+def create_requests_session(pool_size):
+    """Return a requests session keeping up to pool_size connections per host alive."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@locked_cache
+def get_http_client():
+    """Return the httpx client shared by all OpenAI clients, created on first use."""
+    return create_http_client(
+        cfg.http_pool_size, cfg.http_connect_timeout, cfg.http_read_timeout, cfg.http_keepalive_seconds
+    )
+
+
+@locked_cache
+def get_requests_session():
+    """Return the requests session shared by all Azure Search clients, created on first use."""
+    return create_requests_session(cfg.http_pool_size)
+
+
+def search_transport():
+    """Return an Azure SDK transport on the shared session.
+
+    Every client gets its own transport object, as clients close their
+    transport when they are closed; the session itself stays open.
+    """
+    from azure.core.pipeline.transport import RequestsTransport
+
+    return RequestsTransport(
+        session=get_requests_session(),
+        session_owner=False,
+        connection_timeout=cfg.http_connect_timeout,
+        read_timeout=cfg.http_read_timeout,
+    )
@@ -1,6 +1,78 @@
-from pdf2image import convert_from_path
+import multiprocessing
+import os
+import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
 
-def extract_slides(pdf_path):
+def extract_slides(pdf_path, get_slide_file, max_workers=None, pages_per_task=4, dpi=200):
+    """Render the pages of a PDF to image files and yield their paths in page order.
+
+    Pages are rendered in small page ranges across a process pool and written
+    to disk as soon as they are produced, so only a handful of pages is held in
+    memory at any time. Pages whose image file already exists are skipped.
+    """
     print(f"Extracting slides from {pdf_path}...")
-    images = convert_from_path(pdf_path)
-    return images
+    page_count = pdfinfo_from_path(pdf_path)["Pages"]
+    slide_files = [get_slide_file(page_number) for page_number in range(1, page_count + 1)]
+    missing_pages = [
+        page_number for page_number, slide_file in enumerate(slide_files, start=1)
+        if not os.path.exists(slide_file)
+    ]
+    if not missing_pages:
+        yield from slide_files
+        return
+
+    print(f"Rendering {len(missing_pages)} of {page_count} pages")
+    page_ranges = group_pages(missing_pages, pages_per_task)
+    progress_bar = tqdm.tqdm(total=len(missing_pages), desc="Rendering slide images")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_process_context()) as executor:
+        futures = {
+            page_range[0]: (page_range, executor.submit(
+                _render_pages, pdf_path, page_range, [slide_files[page_number - 1] for page_number in page_range], dpi
+            ))
+            for page_range in page_ranges
+        }
+        try:
+            page_number = 1
+            while page_number <= page_count:
+                if page_number in futures:
+                    page_range, future = futures[page_number]
+                    rendered_files = future.result()
+                    progress_bar.update(len(page_range))
+                    yield from rendered_files
+                    page_number += len(page_range)
+                else:
+                    yield slide_files[page_number - 1]
+                    page_number += 1
+        finally:
+            for _, future in futures.values():
+                future.cancel()
+            progress_bar.close()
+
+def group_pages(page_numbers, pages_per_task):
+    """Split page numbers into runs of consecutive pages of at most pages_per_task."""
+    page_ranges = []
+    for page_number in page_numbers:
+        current = page_ranges[-1] if page_ranges else None
+        if current and current[-1] == page_number - 1 and len(current) < pages_per_task:
+            current.append(page_number)
+        else:
+            page_ranges.append([page_number])
+    return page_ranges
+
+def _process_context():
+    # Other pipeline stages run in threads meanwhile, and forking a
+    # multi-threaded process can deadlock the child, so start fresh processes
+    start_methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in start_methods else "spawn")
+
+def _render_pages(pdf_path, page_range, slide_files, dpi):
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_range[0], last_page=page_range[-1])
+    for image, slide_file in zip(images, slide_files):
+        # Write to a temporary file first so an interrupted run never leaves a
+        # truncated image behind that would be skipped on the next run
+        temporary_file = f"{slide_file}.tmp"
+        image.save(temporary_file, 'PNG')
+        image.close()
+        os.replace(temporary_file, slide_file)
+    return slide_files
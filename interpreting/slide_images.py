@@ -0,0 +1,94 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+MIME_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def encode_slide_image(slide_file, max_edge=2048, image_format="jpeg", quality=85):
+    """Return a data URL of a slide image prepared for a vision request.
+
+    The rendered PNG is scaled down so that its longer edge is at most
+    max_edge pixels (0 keeps the size) and re-encoded in image_format. The
+    slide file itself is left untouched.
+    """
+    image_format = image_format.lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Unsupported slide image format: {image_format}")
+
+    with Image.open(slide_file) as image:
+        image.load()
+        if max_edge and max(image.size) > max_edge:
+            scale = max_edge / max(image.size)
+            image = image.resize(
+                (max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS
+            )
+        if image_format == "jpeg":
+            image = _flatten(image)
+
+        buffer = io.BytesIO()
+        if image_format == "png":
+            image.save(buffer, "PNG", optimize=True)
+        else:
+            image.save(buffer, image_format.upper(), quality=quality)
+    encoded_content = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return f"data:{MIME_TYPES[image_format]};base64,{encoded_content}"
+
+
+def perceptual_hash(slide_file, hash_size=16):
+    """Return the difference hash of a slide image as a hex string.
+
+    The image is reduced to hash_size rows of hash_size + 1 gray values and
+    every bit records whether a pixel is brighter than its right neighbour,
+    so small rendering differences change only a few of the hash_size**2 bits.
+    """
+    with Image.open(slide_file) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))
+        pixels = np.asarray(
+            _flatten(image).convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0),
+            dtype=np.int16,
+        )
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(first_hash, second_hash):
+    """Return the number of differing bits of two perceptual hashes."""
+    return bin(int(first_hash, 16) ^ int(second_hash, 16)).count("1")
+
+
+def find_duplicates(slide_hashes, max_distance, candidates=None):
+    """Map slides to an earlier-listed representative whose hash is within max_distance bits.
+
+    slide_hashes maps slide files to their perceptual hashes; the first listed
+    slide of every group of near-identical slides is its representative. Only
+    the slides in candidates (default: all) may become duplicates, the others
+    are representatives. Returns {duplicate slide file: representative slide file}.
+    """
+    candidates = set(slide_hashes if candidates is None else candidates)
+    representatives = []
+    duplicates = {}
+    for slide_file, slide_hash in slide_hashes.items():
+        if slide_file in candidates:
+            representative = min(
+                representatives, key=lambda other: hash_distance(slide_hash, slide_hashes[other]), default=None
+            )
+            if representative is not None and hash_distance(slide_hash, slide_hashes[representative]) <= max_distance:
+                duplicates[slide_file] = representative
+                continue
+        representatives.append(slide_file)
+    return duplicates
+
+
+def _flatten(image):
+    """Convert an image to RGB, placing transparent areas on a white background."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
@@ -1,14 +1,26 @@
+import json
+import os
+import re
 import sys
 import tqdm
-import base64
+import batch_jobs
+import config as cfg
 import embeddings
 import interpreting.slide_extractor as extractor
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+import numpy as np
+from concurrency import map_ordered
+from disk_cache import make_key
+from interpreting.slide_images import encode_slide_image, find_duplicates, perceptual_hash
 from llm import get_chat_model
 from prompt_loader import load_prompt
+from repository import fingerprint_file
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
 
-def _extract_text_from_message(message: AIMessage) -> str:
+
+def _extract_text_from_message(message: "AIMessage") -> str:
     """Normalize LangChain message content into printable text."""
     content = message.content
     if isinstance(content, str):
@@ -22,53 +34,255 @@ def _extract_text_from_message(message: AIMessage) -> str:
     return str(content)
 
 
+def _image_content(slide_file):
+    image_url = encode_slide_image(
+        slide_file,
+        max_edge=cfg.interpreting_image_max_edge,
+        image_format=cfg.interpreting_image_format,
+        quality=cfg.interpreting_image_quality,
+    )
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": image_url,
+            "detail": cfg.interpreting_image_detail,
+        },
+    }
+
+
+def _interpret_slide(client, system_message, slide_file):
+    return _extract_text_from_message(client.invoke(_slide_messages(system_message, None, [slide_file])))
+
+
+def _slide_messages(system_message, batch_prompt, slide_files):
+    """Return the messages of a request describing one slide, or several with batch_prompt."""
+    from langchain_core.messages import HumanMessage
+
+    if len(slide_files) == 1:
+        return [system_message, HumanMessage(content=[_image_content(slide_files[0])])]
+
+    content = [{"type": "text", "text": batch_prompt}]
+    for number, slide_file in enumerate(slide_files, start=1):
+        content.append({"type": "text", "text": f"Slide {number}:"})
+        content.append(_image_content(slide_file))
+    return [system_message, HumanMessage(content=content)]
+
+
+def _interpret_slide_batch(client, system_message, batch_prompt, slide_files, response=None):
+    """Describe several slides with one request.
+
+    The response can be passed in if the request was already sent as part
+    of a batch job. Slides missing from the JSON response, or all of them if
+    it cannot be parsed, are interpreted again with one request each.
+    """
+    if response is None:
+        response = _extract_text_from_message(client.invoke(_slide_messages(system_message, batch_prompt, slide_files)))
+    if len(slide_files) == 1:
+        return [response]
+
+    descriptions = parse_batch_response(response, len(slide_files))
+    if len(descriptions) < len(slide_files):
+        print(f"Interpreting {len(slide_files) - len(descriptions)} slides of a batch one by one")
+    return [
+        descriptions.get(number) or _interpret_slide(client, system_message, slide_file)
+        for number, slide_file in enumerate(slide_files, start=1)
+    ]
+
+
+def parse_batch_response(response, slide_count):
+    """Return {slide number: description} for the well-formed entries of a batch response."""
+    match = re.search(r"[\[{].*[\]}]", response, re.DOTALL)
+    if match is None:
+        return {}
+    try:
+        parsed = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    entries = parsed.get("slides", []) if isinstance(parsed, dict) else parsed
+    descriptions = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        number, description = entry.get("slide"), entry.get("description")
+        if isinstance(number, int) and 1 <= number <= slide_count and isinstance(description, str) and description.strip():
+            descriptions[number] = description.strip()
+    return descriptions
+
+
 def interpret_slides(repository):
-    if repository.read_slide_descriptions():
-        print("Slides already interpreted")
-        return
-    
     slides_file = repository.get_slides_file()
-    slide_files = repository.load_slides()
-    if len(slide_files) == 0:
-        slides = extractor.extract_slides(slides_file)
-        slide_files = repository.save_slides(slides)
+    pdf_fingerprints = {"pdf": fingerprint_file(slides_file)}
+    recorded_pdf_fingerprints = repository.read_fingerprints(
+        "slides", adopt=pdf_fingerprints if repository.load_slides() else None
+    )
+    if recorded_pdf_fingerprints != pdf_fingerprints:
+        # Render the changed deck from scratch, unchanged pages are recognized by their image hash
+        repository.clear_slides()
+
+    slide_files = list(extractor.extract_slides(
+        slides_file,
+        repository.get_slide_file,
+        max_workers=cfg.render_workers or None,
+        pages_per_task=cfg.render_pages_per_task,
+    ))
+    repository.save_fingerprints("slides", pdf_fingerprints)
         
     if not slide_files:
         print(f"No slide images were extracted from {slides_file}.")
         sys.exit(1)
-    
-    print(f"Interpreting {len(slide_files)} slides...")
-    
-    system_message = SystemMessage(content=load_prompt("slide_interpreter_system"))
+
+    system_prompt = load_prompt("slide_interpreter_system")
+    slide_fingerprints = {
+        slide_file: make_key(system_prompt, fingerprint_file(slide_file)) for slide_file in slide_files
+    }
+    previous_descriptions = repository.read_slide_descriptions() or []
+    recorded_slide_fingerprints = repository.read_fingerprints(
+        "interpret", adopt=slide_fingerprints if previous_descriptions else None
+    ) or {}
+    previous_embeddings = np.array(repository.read_slide_embeddings(previous_descriptions)) if previous_descriptions else []
+    # Previous descriptions are looked up by fingerprint, so slides that only moved
+    # to another page after a page was inserted or removed are taken over as well
+    described_slides = {}
+    duplicate_fingerprints = {}
+    previous_hashes = {}
+    for description, description_embedding in zip(previous_descriptions, previous_embeddings):
+        slide_fingerprint = recorded_slide_fingerprints.get(description["slide_file"])
+        if slide_fingerprint is None:
+            continue
+        if description.get("image_hash"):
+            previous_hashes[slide_fingerprint] = description["image_hash"]
+        if description.get("duplicate_of"):
+            duplicate_fingerprints[slide_fingerprint] = recorded_slide_fingerprints.get(description["duplicate_of"])
+        else:
+            described_slides[slide_fingerprint] = (description["description"], description_embedding)
+    reusable_descriptions = {
+        slide_file: described_slides[slide_fingerprint]
+        for slide_file, slide_fingerprint in slide_fingerprints.items()
+        if slide_fingerprint in described_slides
+    }
+    # Slides that took over the description of another slide keep it while that slide is unchanged
+    slide_files_by_fingerprint = {}
+    for slide_file in slide_files:
+        slide_files_by_fingerprint.setdefault(slide_fingerprints[slide_file], slide_file)
+    previous_duplicates = {}
+    for slide_file in slide_files:
+        representative = slide_files_by_fingerprint.get(duplicate_fingerprints.get(slide_fingerprints[slide_file]))
+        if slide_file not in reusable_descriptions and slide_fingerprints.get(representative) in described_slides:
+            reusable_descriptions[slide_file] = reusable_descriptions[representative]
+            previous_duplicates[slide_file] = representative
+    changed_slide_files = [slide_file for slide_file in slide_files if slide_file not in reusable_descriptions]
+    if (
+        not changed_slide_files
+        and recorded_slide_fingerprints == slide_fingerprints
+        and len(previous_descriptions) == len(slide_files)
+    ):
+        print("Slides already interpreted")
+        return
+
+    slide_hashes = {}
+    duplicates = dict(previous_duplicates)
+    if cfg.interpreting_dedupe:
+        slide_hashes = _slide_hashes(slide_files, slide_fingerprints, previous_hashes)
+        # Changed slides are compared with the described slides first; builds of an
+        # animated slide only add content, so the last of a group is taken as representative
+        changed = set(changed_slide_files)
+        ordered_slide_files = [
+            slide_file for slide_file in reversed(slide_files)
+            if slide_file not in changed and slide_file not in previous_duplicates
+        ] + [slide_file for slide_file in reversed(slide_files) if slide_file in changed]
+        duplicates.update(find_duplicates(
+            {slide_file: slide_hashes[slide_file] for slide_file in ordered_slide_files},
+            cfg.interpreting_dedupe_max_distance,
+            candidates=changed,
+        ))
+    representative_slide_files = [slide_file for slide_file in changed_slide_files if slide_file not in duplicates]
+
+    # Slides described by an interrupted run are resumed from the journal, only their embeddings are missing
+    journaled_by_fingerprint = dict(repository.read_journal("interpret").values())
+    journaled_descriptions = {
+        slide_file: journaled_by_fingerprint[slide_fingerprints[slide_file]]
+        for slide_file in representative_slide_files
+        if slide_fingerprints[slide_file] in journaled_by_fingerprint
+    }
+    uninterpreted_slide_files = [
+        slide_file for slide_file in representative_slide_files if slide_file not in journaled_descriptions
+    ]
+
+    print(
+        f"Interpreting {len(uninterpreted_slide_files)} of {len(slide_files)} slides, "
+        f"{len(changed_slide_files) - len(representative_slide_files)} near-duplicates reuse another slide..."
+    )
+
+    from langchain_core.messages import SystemMessage
+
+    system_message = SystemMessage(content=system_prompt)
     client = get_chat_model()
 
+    batch_prompt = load_prompt("slide_interpreter_batch")
+    slides_per_request = max(1, cfg.interpreting_slides_per_request)
+    batches = [
+        uninterpreted_slide_files[idx:idx + slides_per_request]
+        for idx in range(0, len(uninterpreted_slide_files), slides_per_request)
+    ]
+    # In job mode all requests are sent as one batch job first; requests the
+    # job did not answer are sent through the synchronous client below
+    job_results = batch_jobs.run_batch(repository, "interpret", {
+        _batch_key(idx): _slide_messages(system_message, batch_prompt, batch) for idx, batch in enumerate(batches)
+    }) if cfg.batch_enabled else {}
+    progress_bar = tqdm.tqdm(total=len(uninterpreted_slide_files), unit="chunk")
+
+    def interpret_batch(args):
+        idx, batch = args
+        batch_descriptions = _interpret_slide_batch(
+            client, system_message, batch_prompt, batch, response=job_results.get(_batch_key(idx))
+        )
+        for slide_file, description in zip(batch, batch_descriptions):
+            repository.append_journal("interpret", slide_file, slide_fingerprints[slide_file], description)
+        progress_bar.update(len(batch))
+        return batch_descriptions
+
+    try:
+        for batch, batch_descriptions in zip(
+            batches, map_ordered(interpret_batch, enumerate(batches), cfg.interpreting_max_concurrency)
+        ):
+            journaled_descriptions.update(zip(batch, batch_descriptions))
+    finally:
+        progress_bar.close()
+
+    new_descriptions = [journaled_descriptions[slide_file] for slide_file in representative_slide_files]
+    new_embeddings = embeddings.generate_embeddings_batch(new_descriptions)
+    reusable_descriptions.update(zip(representative_slide_files, zip(new_descriptions, new_embeddings)))
     descriptions = []
-    progress_bar = tqdm.tqdm(total=len(slide_files), unit="chunk")
     for slide_file in slide_files:
-        with open(slide_file, "rb") as f:
-            encoded_content = base64.b64encode(f.read()).decode('utf-8')
-        current_messages = [
-            system_message,
-            HumanMessage(
-                content=[
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{encoded_content}"
-                        },
-                    }
-                ]
-            ),
-        ]
-
-        response_text = _extract_text_from_message(client.invoke(current_messages))
+        description, description_embedding = reusable_descriptions[duplicates.get(slide_file, slide_file)]
         descriptions.append({
             "slide_file": slide_file,
-            "description": response_text,
-            "embeddings": embeddings.generate_embeddings(response_text)
+            "description": description,
+            "embeddings": description_embedding,
         })
-        progress_bar.update(1)
+        if slide_file in slide_hashes:
+            descriptions[-1]["image_hash"] = slide_hashes[slide_file]
+        if slide_file in duplicates:
+            descriptions[-1]["duplicate_of"] = duplicates[slide_file]
+
+    repository.save_slide_descriptions(descriptions)
+    repository.save_fingerprints("interpret", slide_fingerprints)
+    repository.clear_journal("interpret")
+
+
+def _batch_key(idx):
+    return f"slides_{idx + 1:03d}"
+
 
-    progress_bar.close()
-    
-    repository.save_slide_descriptions(descriptions)
\ No newline at end of file
+def _slide_hashes(slide_files, slide_fingerprints, previous_hashes):
+    """Return the perceptual hash of every slide, reusing the hashes recorded for the same fingerprint."""
+    slide_hashes = {
+        slide_file: previous_hashes[slide_fingerprints[slide_file]]
+        for slide_file in slide_files
+        if slide_fingerprints[slide_file] in previous_hashes
+    }
+    missing_slide_files = [slide_file for slide_file in slide_files if slide_file not in slide_hashes]
+    slide_hashes.update(zip(
+        missing_slide_files, map_ordered(perceptual_hash, missing_slide_files, os.cpu_count() or 1)
+    ))
+    return slide_hashes
@@ -1,8 +1,9 @@
-from docx import Document
 import re
 
 
 def extract_paragraphs_from_docx(file_path):
+    from docx import Document
+
     print(f"Extracting paragraphs from {file_path}")
     doc = Document(file_path)
     paragraphs = []
@@ -15,30 +16,45 @@ def extract_paragraphs_from_docx(file_path):
     
     return paragraphs
 
-def concatenate_paragraphs(paragraphs, max_length):
+def concatenate_paragraphs(paragraphs, max_length, length=len):
+    """Pack paragraphs into chunks of at most max_length, never splitting a paragraph.
+
+    length measures a paragraph, by default in characters; pass a token
+    counter to pack by tokens. A paragraph longer than max_length becomes a
+    chunk of its own.
+    """
     print(f"Creating chunks from paragraphs with  {max_length} max length")
     chunks = []
     current_chunk = ""
+    current_len = 0
 
     for para in paragraphs:
         cleaned = para.strip()
         if not cleaned:
             continue
 
-        projected_len = len(current_chunk) + len(cleaned) + (1 if current_chunk else 0)
+        para_len = length(cleaned)
+        projected_len = current_len + para_len + (1 if current_chunk else 0)
         if max_length > 0 and current_chunk and projected_len > max_length:
             chunks.append(current_chunk)
             current_chunk = cleaned
+            current_len = para_len
         else:
             current_chunk = cleaned if not current_chunk else f"{current_chunk}\n{cleaned}"
+            current_len = projected_len
 
     if current_chunk:
         chunks.append(current_chunk)
 
     return chunks
 
-def extract_chunks_from_docx(file_path, max_context_length=8000):
+def chunk_tail(chunk, paragraph_count):
+    """Return the last paragraphs of a chunk, separated like lectored output."""
+    paragraphs = [para for para in chunk.split("\n") if para.strip()]
+    return "\n\n".join(paragraphs[-paragraph_count:])
+
+def extract_chunks_from_docx(file_path, max_context_length=8000, length=len):
     paragraphs = extract_paragraphs_from_docx(file_path)
-    chunks = concatenate_paragraphs(paragraphs, max_context_length)
+    chunks = concatenate_paragraphs(paragraphs, max_context_length, length)
     
     return chunks
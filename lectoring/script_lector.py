@@ -1,12 +1,20 @@
+import batch_jobs
+import config as cfg
 import embeddings
 import lectoring.doc_extractor as de
 import tqdm
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from llm import get_chat_model
+from concurrency import map_ordered
+from disk_cache import make_key
+from llm import estimate_tokens, get_chat_model
 from prompt_loader import load_prompt
+from repository import fingerprint_file
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
 
-def _extract_text_from_message(message: AIMessage) -> str:
+
+def _extract_text_from_message(message: "AIMessage") -> str:
     """Normalize LangChain message content into printable text."""
     content = message.content
     if isinstance(content, str):
@@ -23,64 +31,209 @@ def convert_to_json(script_id, content):
     print(f"Converting lectored output to JSON for script {script_id}")
     paragraphs = content.split('\n\n')
     paragraphs = [p for p in paragraphs if p.strip()]  # Remove empty paragraphs
+    paragraph_embeddings = embeddings.generate_embeddings_batch(paragraphs)
     result = {
         "id": script_id,
         "content": [
             {
                 "id": idx + 1,
                 "text": para,
-                "embeddings": embeddings.generate_embeddings(para)
-            } for idx, para in enumerate(tqdm.tqdm(paragraphs))
+                "embeddings": para_embeddings
+            } for idx, (para, para_embeddings) in enumerate(zip(paragraphs, paragraph_embeddings))
         ]
     }
     return result
 
 def lector(repository):
-    if repository.read_json_script():
-        print("Script already lectored")
-        return
-    
     lectored_output = repository.read_lectored_output()
-    if not lectored_output:
+    transcript_fingerprints = {"transcript": fingerprint_file(repository.get_transcript_file())}
+    recorded_fingerprints = repository.read_fingerprints(
+        "transcript", adopt=transcript_fingerprints if lectored_output else None
+    )
+    if not lectored_output or recorded_fingerprints != transcript_fingerprints:
         lectored_output = lector_raw(repository)
         repository.save_lectored_output(lectored_output)
+        repository.save_fingerprints("transcript", transcript_fingerprints)
+
+    json_script = repository.read_json_script()
+    script_fingerprints = {"script": make_key(lectored_output)}
+    recorded_fingerprints = repository.read_fingerprints(
+        "script", adopt=script_fingerprints if json_script else None
+    )
+    if json_script and recorded_fingerprints == script_fingerprints:
+        print("Script already lectored")
+        return
         
     json = convert_to_json(repository.get_script_id(), lectored_output)
     repository.save_json_script(json)
+    repository.save_fingerprints("script", script_fingerprints)
 
 def lector_raw(repository):
     file = repository.get_transcript_file()
     print(f"Lectoring transcript from {file}")
     
     client = get_chat_model()
-    system_message = SystemMessage(content=load_prompt("script_lector_system"))
-    response_text = ""
-    lectored_paragraphs = []
-    chunks = de.extract_chunks_from_docx(file, 1500)
+    from langchain_core.messages import SystemMessage
+
+    system_prompt = load_prompt("script_lector_system")
+    system_message = SystemMessage(content=system_prompt)
+    paragraphs = de.extract_paragraphs_from_docx(file)
+    chunks = de.concatenate_paragraphs(paragraphs, _chunk_token_budget(system_prompt, paragraphs), estimate_tokens)
+
+    # Chunks whose prompt is unchanged since the last run are taken over as they are
+    recorded_fingerprints = repository.read_fingerprints("lector") or {}
+    reusable_chunks = {
+        recorded_fingerprints.get(_chunk_key(idx)): chunk_response
+        for idx, chunk_response in enumerate(repository.read_lectored_chunks())
+    }
+    # Chunks lectored by an interrupted run are resumed from the journal
+    reusable_chunks.update(
+        (chunk_fingerprint, chunk_response)
+        for chunk_fingerprint, chunk_response in repository.read_journal("lector").values()
+    )
+
+    def journal_chunk(idx, chunk_fingerprint, chunk_response):
+        repository.append_journal("lector", _chunk_key(idx), chunk_fingerprint, chunk_response)
+
     print(f"Lectoring {len(chunks)} chunks")
     progress_bar = tqdm.tqdm(total=len(chunks), unit="chunk")
+    try:
+        if cfg.batch_enabled:
+            chunk_responses, chunk_fingerprints = _lector_chunks_batch(
+                repository, client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar
+            )
+        elif cfg.lectoring_parallel:
+            chunk_responses, chunk_fingerprints = _lector_chunks_parallel(
+                client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar
+            )
+        else:
+            chunk_responses, chunk_fingerprints = _lector_chunks_sequential(
+                client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar
+            )
+    finally:
+        progress_bar.close()
+
+    repository.save_lectored_chunks(chunk_responses)
+    repository.save_fingerprints(
+        "lector", {_chunk_key(idx): chunk_fingerprint for idx, chunk_fingerprint in enumerate(chunk_fingerprints)}
+    )
+    repository.clear_journal("lector")
+    return "".join(f"{chunk_response}\n" for chunk_response in chunk_responses)
+
+def _lector_chunks_sequential(client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar):
+    """Lector chunks one after another, using the lectored output as context."""
+    chunk_responses = []
+    chunk_fingerprints = []
+    lectored_paragraphs = []
     for idx, chunk in enumerate(chunks):
         previous_context = "\n\n".join(lectored_paragraphs[-3:])
-
-        user_message = ( 
-            "REFERENCE_PREVIOUS:\n"
-            f"{previous_context or '<none>'}\n\n"
-            "CURRENT:\n"
-            f"{chunk}"
+        chunk_fingerprint = _chunk_fingerprint(system_message, previous_context, chunk)
+        chunk_response = reusable_chunks.get(chunk_fingerprint)
+        if chunk_response is None:
+            chunk_response = _lector_chunk(client, system_message, previous_context, chunk)
+            journal_chunk(idx, chunk_fingerprint, chunk_response)
+        chunk_responses.append(chunk_response)
+        chunk_fingerprints.append(chunk_fingerprint)
+        lectored_paragraphs.extend(
+            [para for para in chunk_response.split("\n\n") if para.strip()]
         )
+        progress_bar.update(1)
+    return chunk_responses, chunk_fingerprints
 
-        current_messages = [
-            system_message,
-            HumanMessage(content=user_message),
-        ]
+def _lector_chunks_parallel(client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar):
+    """Lector all chunks concurrently, using the raw transcript tail as context.
 
-        chunk_response = _extract_text_from_message(client.invoke(current_messages)).strip()
-        response_text += chunk_response + "\n"
-        lectored_paragraphs.extend(
-            [para for para in chunk_response.split("\n\n") if para.strip()]
+    Taking the reference context from the previous raw chunk instead of the
+    previous LLM output removes the dependency between consecutive chunks.
+    """
+    previous_contexts, chunk_fingerprints = _raw_chunk_contexts(system_message, chunks)
+
+    def lector_chunk(args):
+        idx, (previous_context, chunk, chunk_fingerprint) = args
+        chunk_response = reusable_chunks.get(chunk_fingerprint)
+        if chunk_response is None:
+            chunk_response = _lector_chunk(client, system_message, previous_context, chunk)
+            journal_chunk(idx, chunk_fingerprint, chunk_response)
+        progress_bar.update(1)
+        return chunk_response
+
+    chunk_responses = map_ordered(
+        lector_chunk, enumerate(zip(previous_contexts, chunks, chunk_fingerprints)), cfg.lectoring_max_workers
+    )
+    return chunk_responses, chunk_fingerprints
+
+def _lector_chunks_batch(repository, client, system_message, chunks, reusable_chunks, journal_chunk, progress_bar):
+    """Lector all chunks in one batch job, using the raw transcript tail as context like the parallel mode.
+
+    Chunks the job did not answer are lectored with the synchronous client.
+    """
+    previous_contexts, chunk_fingerprints = _raw_chunk_contexts(system_message, chunks)
+    job_results = batch_jobs.run_batch(repository, "lector", {
+        _chunk_key(idx): _lector_messages(system_message, previous_context, chunk)
+        for idx, (previous_context, chunk, chunk_fingerprint) in enumerate(
+            zip(previous_contexts, chunks, chunk_fingerprints)
         )
+        if chunk_fingerprint not in reusable_chunks
+    })
+
+    chunk_responses = []
+    for idx, (previous_context, chunk, chunk_fingerprint) in enumerate(zip(previous_contexts, chunks, chunk_fingerprints)):
+        chunk_response = reusable_chunks.get(chunk_fingerprint)
+        if chunk_response is None:
+            if _chunk_key(idx) in job_results:
+                chunk_response = job_results[_chunk_key(idx)].strip()
+            else:
+                chunk_response = _lector_chunk(client, system_message, previous_context, chunk)
+            journal_chunk(idx, chunk_fingerprint, chunk_response)
+        chunk_responses.append(chunk_response)
         progress_bar.update(1)
+    return chunk_responses, chunk_fingerprints
+
+def _raw_chunk_contexts(system_message, chunks):
+    """Return the raw transcript tail preceding every chunk and the resulting chunk fingerprints."""
+    previous_contexts = [""] + [de.chunk_tail(chunk, 3) for chunk in chunks[:-1]]
+    chunk_fingerprints = [
+        _chunk_fingerprint(system_message, previous_context, chunk)
+        for previous_context, chunk in zip(previous_contexts, chunks)
+    ]
+    return previous_contexts, chunk_fingerprints
+
+def _chunk_token_budget(system_prompt, paragraphs):
+    """Return how many transcript tokens to send per lector request.
+
+    The lectored chunk comes back about as long as it was sent, so a chunk
+    has to fit into the configured share of the output budget and, together
+    with the system prompt and three reference paragraphs, into the same
+    share of the context window.
+    """
+    reference_tokens = sum(sorted((estimate_tokens(paragraph) for paragraph in paragraphs), reverse=True)[:3])
+    input_budget = (
+        cfg.lectoring_budget_share * cfg.lectoring_context_tokens - estimate_tokens(system_prompt) - reference_tokens
+    )
+    output_budget = cfg.lectoring_budget_share * cfg.lectoring_output_tokens
+    return max(1, int(min(input_budget, output_budget)))
+
+def _chunk_key(idx):
+    return f"chunk_{idx + 1:03d}"
+
+def _chunk_fingerprint(system_message, previous_context, chunk):
+    return make_key(system_message.content, previous_context, chunk)
+
+def _lector_chunk(client, system_message, previous_context, chunk):
+    current_messages = _lector_messages(system_message, previous_context, chunk)
+    return _extract_text_from_message(client.invoke(current_messages)).strip()
+
+def _lector_messages(system_message, previous_context, chunk):
+    from langchain_core.messages import HumanMessage
+
+    user_message = ( 
+        "REFERENCE_PREVIOUS:\n"
+        f"{previous_context or '<none>'}\n\n"
+        "CURRENT:\n"
+        f"{chunk}"
+    )
 
-    progress_bar.close()
-    return response_text
-    
\ No newline at end of file
+    return [
+        system_message,
+        HumanMessage(content=user_message),
+    ]
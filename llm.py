@@ -1,29 +1,315 @@
 import config as cfg
-from functools import lru_cache
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+import http_transport
+import json
+import time
+import tracing
+from contextlib import contextmanager
+from concurrency import locked_cache
+from disk_cache import DiskCache, make_key
+from rate_limiter import RateLimiter, create_shared_state
 
 DEFAULT_CHAT_DEPLOYMENT = "gpt-4o"
 DEFAULT_EMBEDDING_DEPLOYMENT = "text-embedding-ada-002"
+LOW_DETAIL_IMAGE_TOKENS = 85
 
 
-@lru_cache(maxsize=None)
+_request_slots = None
+_shared_rate_limits = {}
+
+
+def set_request_slots(semaphore):
+    """Bound the number of concurrent model requests with a shared semaphore.
+
+    The batch runner passes one semaphore to all of its worker processes so
+    that a whole course shares a single limit on requests in flight.
+    """
+    global _request_slots
+    _request_slots = semaphore
+
+
+@contextmanager
+def request_slot():
+    if _request_slots is None:
+        yield
+        return
+    with _request_slots:
+        yield
+
+
+class ThrottledChatModel:
+    """Chat model wrapper that keeps requests within the deployment's rate limits.
+
+    Every call waits for the rate limiter and for a free request slot, and is
+    retried after the delay requested by the service if it hits a 429.
+    """
+
+    def __init__(self, model, limiter, service="chat"):
+        self.model = model
+        self.limiter = limiter
+        self.service = service
+
+    def invoke(self, messages):
+        return _call_limited(
+            self.service, self.limiter, lambda: self.model.invoke(messages),
+            estimate_message_tokens(messages), count_tokens=_response_tokens,
+        )
+
+
+class ThrottledEmbeddings:
+    """Embeddings wrapper that keeps requests within the deployment's rate limits."""
+
+    def __init__(self, model, limiter, service="embeddings"):
+        self.model = model
+        self.limiter = limiter
+        self.service = service
+
+    def embed_query(self, text):
+        return _call_limited(self.service, self.limiter, lambda: self.model.embed_query(text), estimate_tokens(text))
+
+    def embed_documents(self, texts):
+        return _call_limited(
+            self.service, self.limiter, lambda: self.model.embed_documents(texts),
+            sum(estimate_tokens(text) for text in texts),
+        )
+
+
+def _call_limited(service, limiter, request, estimated_tokens, count_tokens=None):
+    """Send a request within the rate limits and record it in the active trace.
+
+    The recorded latency is the one of the last attempt; earlier attempts that
+    were rate limited are counted as retries. Responses without usage metadata,
+    such as embeddings, are recorded with the estimated tokens as prompt tokens.
+    """
+    latencies = []
+
+    def send():
+        with request_slot():
+            started = time.perf_counter()
+            try:
+                return request()
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    try:
+        result = limiter.call(send, estimated_tokens, _retry_after, count_tokens=count_tokens)
+    except Exception:
+        tracing.record_call(service, latencies[-1] if latencies else 0.0,
+                            retries=max(0, len(latencies) - 1), failed=True)
+        raise
+    usage = getattr(result, "usage_metadata", None) or {}
+    tracing.record_call(
+        service,
+        latencies[-1],
+        prompt_tokens=usage.get("input_tokens", 0 if usage else estimated_tokens),
+        completion_tokens=usage.get("output_tokens", 0),
+        retries=len(latencies) - 1,
+    )
+    return result
+
+
+class CachedChatModel:
+    """Chat model wrapper that replays stored responses for identical requests.
+
+    Requests are keyed by deployment, temperature, the hash of the system
+    prompt and the full message payload.
+    """
+
+    def __init__(self, model, cache, *, deployment, temperature, bypass=False):
+        self.model = model
+        self.cache = cache
+        self.deployment = deployment
+        self.temperature = temperature
+        self.bypass = bypass
+
+    def invoke(self, messages):
+        key = self._cache_key(messages)
+        if not self.bypass:
+            cached = self.cache.get(key)
+            if cached is not None:
+                from langchain_core.messages import AIMessage
+
+                tracing.record_cache_hits(f"chat:{self.deployment}")
+                return AIMessage(content=json.loads(cached)["content"])
+
+        response = self.model.invoke(messages)
+        self.cache.set(key, json.dumps({"content": response.content}, ensure_ascii=False).encode("utf-8"))
+        return response
+
+    def _cache_key(self, messages):
+        system_prompt = "".join(str(message.content) for message in messages if message.type == "system")
+        payload = json.dumps(
+            [{"type": message.type, "content": message.content} for message in messages],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return make_key(self.deployment, self.temperature, make_key(system_prompt), payload)
+
+
+@locked_cache
+def get_rate_limiter(deployment: str):
+    """Return the rate limiter shared by all clients of a deployment."""
+    requests_per_minute, tokens_per_minute = cfg.rate_limits.get(deployment, (0, 0))
+    return RateLimiter(
+        requests_per_minute,
+        tokens_per_minute,
+        max_retries=cfg.llm_max_retries,
+        shared_state=_shared_rate_limits.get(deployment),
+    )
+
+
+def create_shared_rate_limits():
+    """Return shared memory for the budget of every deployment with configured rate limits."""
+    return {deployment: create_shared_state() for deployment in cfg.rate_limits}
+
+
+def set_shared_rate_limits(shared_rate_limits):
+    """Draw from budgets shared with other processes, see create_shared_rate_limits.
+
+    The batch runner passes the same budgets to all of its worker processes,
+    so a lecture that is processed alone can use the whole rate limit.
+    """
+    global _shared_rate_limits
+    _shared_rate_limits = shared_rate_limits
+    get_rate_limiter.cache_clear()
+
+
+def get_rate_limit_stats():
+    """Return the throttling counters of every deployment used so far."""
+    return {
+        deployment: get_rate_limiter(deployment).stats()
+        for deployment in [DEFAULT_CHAT_DEPLOYMENT, DEFAULT_EMBEDDING_DEPLOYMENT, *cfg.rate_limits]
+        if get_rate_limiter(deployment).requests
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text with the local tokenizer.
+
+    The tokenizer is the tiktoken encoding named by [LLM] tokenizer; with
+    "chars", or if the encoding is not available, four characters count as
+    one token.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_message_tokens(messages) -> int:
+    """Estimate prompt plus expected completion tokens of a chat request."""
+    tokens = cfg.llm_completion_tokens_estimate
+    for message in messages:
+        if isinstance(message.content, str):
+            tokens += estimate_tokens(message.content)
+            continue
+        for item in message.content:
+            if item.get("type") == "text":
+                tokens += estimate_tokens(item.get("text", ""))
+            elif item.get("type") == "image_url":
+                # Low detail images are billed at a fixed size regardless of their resolution
+                tokens += LOW_DETAIL_IMAGE_TOKENS if item["image_url"].get("detail") == "low" else cfg.llm_image_tokens_estimate
+    return tokens
+
+
+@locked_cache
+def _get_encoding():
+    if cfg.llm_tokenizer == "chars":
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(cfg.llm_tokenizer)
+    except Exception:
+        return None
+
+
+def _response_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+def _retry_after(error):
+    """Return the delay before retrying a failed request, or None if it must not be retried.
+
+    429 responses are retried after the delay requested by the service, or 0
+    if none was given. Timeouts, conflicts, server errors and connection
+    errors are retried with 0, i.e. with the rate limiter's exponential backoff.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code in (408, 409) or (status_code is not None and status_code >= 500):
+        return 0.0
+    if status_code is None:
+        import openai
+
+        # APITimeoutError is a subclass of APIConnectionError
+        return 0.0 if isinstance(error, openai.APIConnectionError) else None
+    if status_code != 429:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return 0.0
+
+
+@locked_cache
 def get_chat_model(*, deployment: str = DEFAULT_CHAT_DEPLOYMENT, temperature: float = 0.0):
     """Return a cached Azure Chat model configured via LangChain."""
+    model = ThrottledChatModel(
+        _create_chat_client(deployment, temperature), get_rate_limiter(deployment), service=f"chat:{deployment}"
+    )
+    if not cfg.llm_response_cache_enabled:
+        return model
+    return CachedChatModel(
+        model,
+        get_response_cache(),
+        deployment=deployment,
+        temperature=temperature,
+        bypass=cfg.llm_response_cache_bypass,
+    )
+
+
+@locked_cache
+def get_response_cache():
+    """Return the on-disk cache shared by all cached chat models."""
+    return DiskCache(cfg.llm_response_cache_path, cfg.llm_response_cache_max_mb * 1024 * 1024)
+
+
+@locked_cache
+def get_embedding_model(*, deployment: str = DEFAULT_EMBEDDING_DEPLOYMENT):
+    """Return a cached Azure embeddings model configured via LangChain."""
+    return ThrottledEmbeddings(
+        _create_embeddings_client(deployment), get_rate_limiter(deployment), service=f"embeddings:{deployment}"
+    )
+
+
+# LangChain and the OpenAI SDK are imported on first use; they dominate the
+# start-up time of runs in which every stage is already up to date
+def _create_chat_client(deployment, temperature):
+    from langchain_openai import AzureChatOpenAI
+
     return AzureChatOpenAI(
         api_key=cfg.azure_openai_api_key,
         api_version=cfg.azure_openai_version,
         azure_endpoint=cfg.azure_openai_endpoint,
         azure_deployment=deployment,
         temperature=temperature,
+        max_retries=0,
+        http_client=http_transport.get_http_client(),
     )
 
 
-@lru_cache(maxsize=None)
-def get_embedding_model(*, deployment: str = DEFAULT_EMBEDDING_DEPLOYMENT):
-    """Return a cached Azure embeddings model configured via LangChain."""
+def _create_embeddings_client(deployment):
+    from langchain_openai import AzureOpenAIEmbeddings
+
     return AzureOpenAIEmbeddings(
         api_key=cfg.azure_openai_api_key,
         api_version=cfg.azure_openai_version,
         azure_endpoint=cfg.azure_openai_endpoint,
         azure_deployment=deployment,
+        max_retries=0,
+        http_client=http_transport.get_http_client(),
     )
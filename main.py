@@ -1,11 +1,11 @@
-import sys
+import argparse
 import os
-import lectoring.script_lector as lector
-import interpreting.slide_interpreter as interpreter
-import matching.slide_script_matcher as matcher
-import matching.script_search as script_search
-import script_generator_auto as generator
+import time
+import config as cfg
+import llm
+import tracing
 from repository import Repository
+from scheduler import Stage, run_stages
 
 
 def resolve_input_path(arg: str) -> str:
@@ -38,23 +38,134 @@ def resolve_input_path(arg: str) -> str:
     return s
 
 
-if __name__ == "__main__":
+# Every stage imports its module on first use, so a run only loads the
+# dependencies (LangChain, pdf2image, python-docx, Azure SDKs) it needs
+def lector(repository):
+    import lectoring.script_lector as script_lector
+    script_lector.lector(repository)
 
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <script_number | input_dir>")
-        print("Examples:")
-        print("  python main.py 08")
-        print("  python main.py input/08")
-        sys.exit(1)
 
-    arg = sys.argv[1]
-    file_path = resolve_input_path(arg)
+def interpret_slides(repository):
+    import interpreting.slide_interpreter as interpreter
+    interpreter.interpret_slides(repository)
 
-    repository = Repository(file_path)
 
-    lector.lector(repository)
-    interpreter.interpret_slides(repository)
-    script_search.init_script_search(repository)
-    matcher.match_slides_with_script(repository)
+def matching_backend():
+    """Return the backend that finds the slide matches.
+
+    With [Generation] alignment = global the slides are placed without the
+    matches, which are then only candidates for the review UI; they are found
+    in-process, so the search index is neither uploaded nor queried.
+    """
+    return "local" if cfg.slide_alignment == "global" else cfg.matching_backend
+
+
+def init_script_search(repository):
+    if matching_backend() != "local":
+        import matching.script_search as script_search
+        script_search.init_script_search(repository)
+
+
+def match_slides_with_script(repository):
+    import matching.slide_script_matcher as matcher
+    matcher.match_slides_with_script(repository, backend=matching_backend())
+
+
+def generate_script(repository):
+    import script_generator_auto as generator
     generator.generate_script(repository)
-    
\ No newline at end of file
+
+
+# Stages run as soon as the stages producing their inputs are done, so
+# lectoring and slide interpretation of a new lecture overlap
+PIPELINE = [
+    Stage("lector", lector, inputs=["transcript"], outputs=["script"]),
+    Stage("interpret", interpret_slides, inputs=["slide_deck"], outputs=["slide_descriptions"]),
+    Stage("index", init_script_search, inputs=["script"], outputs=["search_index"]),
+    Stage("match", match_slides_with_script, inputs=["script", "slide_descriptions", "search_index"],
+          outputs=["slide_matches"]),
+    Stage("generate", generate_script, inputs=["script", "slide_descriptions", "slide_matches"],
+          outputs=["script_adoc"]),
+]
+
+
+def select_stages(stage_names=None):
+    """Return the pipeline stages with the given names in pipeline order, or all stages.
+
+    All stages leave out the index stage if the search index is not used.
+    """
+    if stage_names is None:
+        return [stage for stage in PIPELINE if stage.name != "index" or matching_backend() != "local"]
+    unknown = set(stage_names) - {stage.name for stage in PIPELINE}
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    return [stage for stage in PIPELINE if stage.name in stage_names]
+
+
+def run_pipeline(file_path: str, timings: dict = None, stages=None, max_parallel_stages=None) -> dict:
+    """Run the pipeline stages for one input folder.
+
+    stages restricts the run to the named stages; by default all stages run.
+    Independent stages run concurrently, at most max_parallel_stages at a
+    time. The wall time of every completed stage is recorded in timings,
+    which is also filled in when another stage fails. The external calls made
+    by every stage are traced to output/<id>/trace.json and summarized at the
+    end.
+    """
+    timings = {} if timings is None else timings
+    selected_stages = select_stages(stages)
+    repository = Repository(file_path)
+    trace = tracing.start_trace(os.path.basename(file_path))
+    import embeddings
+
+    cache_stats_before = embeddings.get_cache_stats() or {}
+
+    def run_stage(stage):
+        started = time.perf_counter()
+        with trace.stage(stage.name):
+            stage.run(repository)
+        timings[stage.name] = time.perf_counter() - started
+
+    try:
+        run_stages(selected_stages, run_stage, max_parallel_stages or cfg.pipeline_max_parallel_stages)
+    finally:
+        cache_stats = embeddings.get_cache_stats()
+        if cache_stats:
+            trace.record_cache_stats("embeddings", {
+                name: value - cache_stats_before.get(name, 0) for name, value in cache_stats.items()
+            })
+        repository.save_trace(trace.to_dict())
+        print()
+        print(trace.format_summary())
+    return timings
+
+
+def parse_stages(value):
+    stage_names = [stage_name.strip() for stage_name in value.split(",") if stage_name.strip()]
+    try:
+        select_stages(stage_names)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return stage_names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a script with slides from a lecture transcript and slide deck.",
+        epilog="Examples: python main.py 08, python main.py input/08 --stages lector,interpret",
+    )
+    parser.add_argument("input", help="script number like 08 or input folder like input/08")
+    parser.add_argument(
+        "--stages", type=parse_stages,
+        help=f"comma-separated stages to run (default: all of {', '.join(stage.name for stage in PIPELINE)})",
+    )
+    args = parser.parse_args()
+
+    file_path = resolve_input_path(args.input)
+
+    run_pipeline(file_path, stages=args.stages)
+
+    for deployment, stats in llm.get_rate_limit_stats().items():
+        print(f"{deployment}: {stats['requests']} requests, {stats['throttled_seconds']:.1f}s throttled, "
+              f"{stats['rate_limited']} rate limited, {stats['failed_attempts']} failed attempts, "
+              f"{stats['retries']} retries")
@@ -0,0 +1,42 @@
+import numpy as np
+from matching.vector_index import normalize_rows
+
+
+def similarity_matrix(slide_embeddings, paragraph_embeddings):
+    """Return the slides x paragraphs cosine similarity matrix."""
+    slide_embeddings = np.asarray(slide_embeddings, dtype=np.float32)
+    paragraph_embeddings = np.asarray(paragraph_embeddings, dtype=np.float32)
+    if slide_embeddings.size == 0 or paragraph_embeddings.size == 0:
+        return np.zeros((len(slide_embeddings), len(paragraph_embeddings)), dtype=np.float32)
+    return normalize_rows(slide_embeddings) @ normalize_rows(paragraph_embeddings).T
+
+
+def align_slides(similarities):
+    """Assign every slide the paragraph it precedes, preserving the slide order.
+
+    Finds the non-decreasing sequence of paragraph indices with the highest
+    total similarity by dynamic programming over the full similarity matrix,
+    in O(slides x paragraphs) time.
+    """
+    slide_count, paragraph_count = similarities.shape
+    if slide_count == 0:
+        return []
+    if paragraph_count == 0:
+        return [0] * slide_count
+
+    paragraph_indices = np.arange(paragraph_count)
+    backpointers = np.empty((slide_count, paragraph_count), dtype=np.int32)
+    scores = similarities[0].astype(np.float64)
+    for slide_idx in range(1, slide_count):
+        # Best predecessor for every paragraph: the best score at any paragraph up to it
+        best_scores = np.maximum.accumulate(scores)
+        backpointers[slide_idx] = np.maximum.accumulate(
+            np.where(scores >= best_scores, paragraph_indices, 0)
+        )
+        scores = similarities[slide_idx] + best_scores
+
+    boundaries = [int(np.argmax(scores))]
+    for slide_idx in range(slide_count - 1, 0, -1):
+        boundaries.append(int(backpointers[slide_idx][boundaries[-1]]))
+    boundaries.reverse()
+    return boundaries
@@ -1,7 +1,9 @@
 import config as cfg
+import http_transport
 
 from azure.search.documents.indexes import SearchIndexClient  
 from azure.core.credentials import AzureKeyCredential  
+from azure.core.exceptions import ResourceNotFoundError
 from azure.search.documents.indexes.models import (
     HnswAlgorithmConfiguration,
     HnswParameters,
@@ -19,22 +21,43 @@ from azure.search.documents.indexes.models import (
     VectorSearchAlgorithmMetric,
     VectorSearchProfile,
 )
-# Initialize the SearchIndexClient
-credential = AzureKeyCredential(cfg.search_api_key)
-index_client = SearchIndexClient(
-    endpoint=cfg.search_api_endpoint, credential=credential
-)
+from concurrency import locked_cache
+
+@locked_cache
+def get_index_client():
+    """Return the SearchIndexClient, created on first use."""
+    return SearchIndexClient(
+        endpoint=cfg.search_api_endpoint,
+        credential=AzureKeyCredential(cfg.search_api_key),
+        transport=http_transport.search_transport(),
+    )
 
 def reinitialize():
-    index_client.delete_index(cfg.index_name)
+    get_index_client().delete_index(cfg.index_name)
     print(f"{cfg.index_name} deleted")
     init_index()
 
+def ensure_index():
+    """Create the index if it is missing and make sure it can be filtered by file_id.
+
+    Indexes created before scripts were kept side by side have no filterable
+    file_id field and are recreated once.
+    """
+    try:
+        index = get_index_client().get_index(cfg.index_name)
+    except ResourceNotFoundError:
+        init_index()
+        return
+    file_id_field = next((field for field in index.fields if field.name == "file_id"), None)
+    if file_id_field is None or not file_id_field.filterable:
+        print(f"{cfg.index_name} cannot be filtered by file_id, recreating it")
+        reinitialize()
+
 def init_index():
 
     # Define the fields for the index
     fields = [
-        SimpleField(name="file_id", type=SearchFieldDataType.String),
+        SimpleField(name="file_id", type=SearchFieldDataType.String, filterable=True),
         SimpleField(name="paragraph_id", type=SearchFieldDataType.String),
         SimpleField(name="vector_id", type=SearchFieldDataType.String, key=True),
         SearchableField(name="text", type=SearchFieldDataType.String),
@@ -90,5 +113,5 @@ def init_index():
     )
 
     # Create or update the index
-    result = index_client.create_or_update_index(index)
+    result = get_index_client().create_or_update_index(index)
     print(f"{result.name} created")
\ No newline at end of file
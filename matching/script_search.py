@@ -1,76 +1,160 @@
-
 import config as cfg
+import http_transport
 
-from azure.core.credentials import AzureKeyCredential  
+from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import (
-    SearchClient
+    SearchClient,
+    SearchIndexingBufferedSender,
 )
+from azure.search.documents.models import VectorizedQuery
 from azure.core.exceptions import HttpResponseError
+from concurrency import locked_cache
+from disk_cache import make_key
 import time
+import tracing
 import matching.init_azure_search as index_mgmt
 
-credential = AzureKeyCredential(cfg.search_api_key)
-search_client = SearchClient(cfg.search_api_endpoint, cfg.index_name, credential)  
+@locked_cache
+def get_search_client():
+    """Return the SearchClient shared by uploads and queries, created on first use."""
+    return SearchClient(
+        cfg.search_api_endpoint, cfg.index_name, _credential(), transport=http_transport.search_transport()
+    )
+
+def _credential():
+    return AzureKeyCredential(cfg.search_api_key)
+
+def file_id_filter(file_id):
+    """OData filter restricting a query to the paragraphs of one script."""
+    escaped_file_id = str(file_id).replace("'", "''")
+    return f"file_id eq '{escaped_file_id}'"
 
 def is_script_search_initialized(repository):
     # Check if the index exists
     try:
-        search_client.get_document(key=f"{repository.get_script_id()}_1")
+        get_search_client().get_document(key=f"{repository.get_script_id()}_1")
         return True
     except HttpResponseError as e:
         return False
 
-def is_script_search_empty(repository):
+def count_script_documents(file_id):
     try:
-        return search_client.get_document_count() == 0
+        results = get_search_client().search(
+            search_text="*", filter=file_id_filter(file_id), include_total_count=True, top=0
+        )
+        return results.get_count()
     except HttpResponseError as e:
-        return False
-    
-    
+        return 0
+
+
 def init_script_search(repository):
-    
-    if is_script_search_initialized(repository):
-        print("Script search already initialized")
-        return
+    """Index the paragraphs of a script next to the scripts already in the index.
+
+    Every script is stored under its own file_id, so switching between
+    lectures only uploads the paragraphs of the current script. Paragraphs
+    whose text and embedding are unchanged since the last upload are not
+    uploaded again.
+    """
+    index_mgmt.ensure_index()
 
-    if not is_script_search_empty(repository):
-        index_mgmt.reinitialize()
-    
     script = repository.read_json_script()
-    print(f"Initializing script search for script {script['id']}")
-    # Create a SearchIndexingBufferedSender
-    search_client = SearchClient(cfg.search_api_endpoint, cfg.index_name, credential)  
-    
+    script_embeddings = repository.read_script_embeddings(script)
     documents = []
-    for paragraph in script["content"]:
+    for paragraph, paragraph_embedding in zip(script["content"], script_embeddings):
         document = {
             "file_id": script["id"],
             "paragraph_id": str(paragraph["id"]),
-            "vector_id": f"{script["id"]}_{paragraph['id']}",
+            "vector_id": f"{script['id']}_{paragraph['id']}",
             "text": paragraph["text"],
-            "content_vector": paragraph["embeddings"]
+            "content_vector": paragraph_embedding.tolist()
         }
         documents.append(document)
+    document_fingerprints = {
+        document["vector_id"]: make_key(document["text"], paragraph_embedding.tobytes())
+        for document, paragraph_embedding in zip(documents, script_embeddings)
+    }
 
-    print(f"Processing {len(documents)} documents...")    
-    try:
-        # Add upload actions for all documents in a single call
-        search_client.upload_documents(documents=documents)
+    recorded_fingerprints = {}
+    if is_script_search_initialized(repository):
+        recorded_fingerprints = repository.read_fingerprints("search_index", adopt=document_fingerprints)
+        if recorded_fingerprints == document_fingerprints:
+            print("Script search already initialized")
+            return
 
+    print(f"Initializing script search for script {script['id']}")
+    changed_documents = [
+        document for document in documents
+        if recorded_fingerprints.get(document["vector_id"]) != document_fingerprints[document["vector_id"]]
+    ]
+    stale_keys = find_stale_documents(script["id"], set(document_fingerprints))
+
+    print(f"Processing {len(changed_documents)} of {len(documents)} documents...")
+    failed_actions = []
+    with tracing.timed_call("search:upload"), SearchIndexingBufferedSender(
+        cfg.search_api_endpoint,
+        cfg.index_name,
+        _credential(),
+        initial_batch_action_count=cfg.search_upload_batch_size,
+        on_error=failed_actions.append,
+        transport=http_transport.search_transport(),
+    ) as sender:
+        if stale_keys:
+            print(f"Removing {len(stale_keys)} outdated documents")
+            sender.delete_documents(documents=[{"vector_id": key} for key in stale_keys])
+        if changed_documents:
+            sender.merge_or_upload_documents(documents=changed_documents)
+
+    if failed_actions:
+        print(f"Failed to index {len(failed_actions)} documents")
+        return
+    print(f"Uploaded {len(changed_documents)} documents in total")
+
+    if wait_for_script_documents(script["id"], len(documents)):
+        print("Script search successfully initialized")
+        repository.save_fingerprints("search_index", document_fingerprints)
+    else:
+        print("Failed to initialize script search within the maximum wait time")
+
+def find_stale_documents(file_id, current_keys):
+    """Return the keys of documents of a script that are no longer part of it."""
+    try:
+        results = get_search_client().search(search_text="*", filter=file_id_filter(file_id), select=["vector_id"])
+        return [result["vector_id"] for result in results if result["vector_id"] not in current_keys]
     except HttpResponseError as e:
         print(f"An error occurred: {e}")
+        return []
 
-    print(f"Uploaded {len(documents)} documents in total")
-    
-    max_wait_time = 10 * 60  # 10 minutes
-    wait_interval = 30  # 30 seconds
-    waited_time = 0
-
-    while waited_time < max_wait_time:
-        if is_script_search_initialized(repository):
-            print("Script search successfully initialized")
-            break
+def wait_for_script_documents(file_id, document_count):
+    """Wait with a short backoff until all documents of a script are searchable."""
+    deadline = time.monotonic() + cfg.search_ready_timeout
+    wait_interval = 0.5
+    while True:
+        if count_script_documents(file_id) == document_count:
+            return True
+        if time.monotonic() + wait_interval > deadline:
+            return False
         time.sleep(wait_interval)
-        waited_time += wait_interval
-    else:
-        print("Failed to initialize script search within the maximum wait time")
\ No newline at end of file
+        wait_interval = min(wait_interval * 2, 8)
+
+def search_paragraphs(file_id, vector, k=3):
+    """Return the k paragraphs of a script that are closest to a vector."""
+    vector_query = VectorizedQuery(vector=list(vector), k_nearest_neighbors=k, fields="content_vector")
+
+    with tracing.timed_call("search:query"):
+        # Pure Vector Search within the paragraphs of this script
+        results = get_search_client().search(
+            search_text=None,
+            vector_queries= [vector_query],
+            filter=file_id_filter(file_id),
+            vector_filter_mode="preFilter",
+            select=["file_id", "paragraph_id", "text"]
+        )
+        return [
+            {
+            "file_id": result["file_id"],
+            "paragraph_id": result["paragraph_id"],
+            "text": result["text"],
+            "score": result["@search.score"]
+            }
+            for result in results
+        ]
@@ -1,51 +1,88 @@
 import config as cfg
-from azure.core.credentials import AzureKeyCredential  
-from azure.search.documents import SearchClient  
 from tqdm import tqdm
-from azure.search.documents.models import (
-    VectorizedQuery,
-)
+from concurrency import map_ordered
+from disk_cache import make_key
+from matching.vector_index import VectorIndex
 
-credential = AzureKeyCredential(cfg.search_api_key)
-search_client = SearchClient(cfg.search_api_endpoint, cfg.index_name, credential)  
+def match_slides_with_script(repository, backend=None):
+    """Find the closest paragraphs of every slide with the local or the azure backend (default: [Matching] backend)."""
+    backend = backend or cfg.matching_backend
+    slides = repository.read_slide_descriptions()
+    script = repository.read_json_script()
+    slide_embeddings = repository.read_slide_embeddings(slides)
 
-def match_slides_with_script(repository):
-    if repository.read_slide_matches():
+    # A slide has to be matched again if its description or the script changed
+    script_fingerprint = make_key(*(paragraph["text"] for paragraph in script["content"]))
+    slide_fingerprints = {
+        slide["slide_file"]: make_key(backend, script_fingerprint, slide_embedding.tobytes())
+        for slide, slide_embedding in zip(slides, slide_embeddings)
+    }
+    previous_matches = repository.read_slide_matches() or []
+    recorded_fingerprints = repository.read_fingerprints(
+        "match", adopt=slide_fingerprints if previous_matches else None
+    ) or {}
+    # Previous results are looked up by fingerprint, so slides that only moved to another page are reused
+    reusable_results = {
+        recorded_fingerprints[match["slide_file"]]: match["results"]
+        for match in previous_matches
+        if match["slide_file"] in recorded_fingerprints
+    }
+    changed = [
+        idx for idx, slide in enumerate(slides) if slide_fingerprints[slide["slide_file"]] not in reusable_results
+    ]
+    if not changed and recorded_fingerprints == slide_fingerprints and len(previous_matches) == len(slides):
         print("Slides already matched with script")
         return
-    
-    slides = repository.read_slide_descriptions()
-    results = []
-    # Initialize the progress bar
-    print(f"Matching {len(slides)} slides with script")
-    progress_bar = tqdm(total=len(slides), desc="Matching slides with script")
-    for slide in slides:
-        vector_query = VectorizedQuery(vector=slide["embeddings"], k_nearest_neighbors=3, fields="content_vector")
-    
-        # Pure Vector Search
-        slide_results = search_client.search(  
-            search_text=None,  
-            vector_queries= [vector_query], 
-            select=["file_id", "paragraph_id", "text"] 
-        )
-        slide_results_mapped = [
-            {
-            "file_id": result["file_id"],
-            "paragraph_id": result["paragraph_id"],
-            "text": result["text"],
-            "score": result["@search.score"]
-            }
-            for result in slide_results
-        ]
-        
-        results.append({
+
+    changed_slides = [slides[idx] for idx in changed]
+    changed_embeddings = slide_embeddings[changed]
+    print(f"Matching {len(changed_slides)} of {len(slides)} slides with script")
+    if backend == "local":
+        results = match_slides_locally(script, repository.read_script_embeddings(script), changed_slides, changed_embeddings)
+    else:
+        results = match_slides_with_search(script["id"], changed_slides, changed_embeddings)
+
+    reusable_results.update((slide_fingerprints[result["slide_file"]], result["results"]) for result in results)
+    repository.save_slide_matches([
+        {
+            "slide_file": slide["slide_file"],
+            "results": reusable_results[slide_fingerprints[slide["slide_file"]]]
+        }
+        for slide in slides
+    ])
+    repository.save_fingerprints("match", slide_fingerprints)
+
+def match_slides_locally(script, script_embeddings, slides, slide_embeddings):
+    index = VectorIndex.from_script(script, script_embeddings)
+    slide_results = index.search(slide_embeddings, k=3)
+    return [
+        {
             "slide_file": slide["slide_file"],
-            "results": slide_results_mapped
-        })
-        # Update the progress bar
+            "results": results
+        }
+        for slide, results in zip(slides, slide_results)
+    ]
+
+def match_slides_with_search(file_id, slides, slide_embeddings):
+    """Query the index for every slide, with a bounded number of queries in flight.
+
+    All queries share one search client; results are returned in slide order.
+    """
+    # The Azure Search SDK is only loaded when the index is actually queried
+    import matching.script_search as script_search
+
+    progress_bar = tqdm(total=len(slides), desc="Matching slides with script")
+
+    def search_slide(slide_with_embedding):
+        slide, slide_embedding = slide_with_embedding
+        slide_results = script_search.search_paragraphs(file_id, slide_embedding.tolist())
         progress_bar.update(1)
+        return {
+            "slide_file": slide["slide_file"],
+            "results": slide_results
+        }
 
-    # Close the progress bar
-    progress_bar.close()
-    
-    repository.save_slide_matches(results)
\ No newline at end of file
+    try:
+        return map_ordered(search_slide, list(zip(slides, slide_embeddings)), cfg.matching_max_concurrency)
+    finally:
+        progress_bar.close()
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class VectorIndex:
+    """In-memory cosine similarity index over a fixed set of embeddings."""
+
+    def __init__(self, documents, vectors):
+        self.documents = list(documents)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = normalize_rows(vectors) if vectors.size else vectors.reshape(0, 0)
+        if len(self.documents) != self.vectors.shape[0]:
+            raise ValueError("Every document needs exactly one vector.")
+
+    @classmethod
+    def from_script(cls, script, vectors):
+        documents = [
+            {
+                "file_id": script["id"],
+                "paragraph_id": str(paragraph["id"]),
+                "text": paragraph["text"],
+            }
+            for paragraph in script["content"]
+        ]
+        return cls(documents, vectors)
+
+    def search(self, query_vectors, k=3):
+        """Return the top k documents for every query in one batched lookup.
+
+        Scores follow the Azure AI Search convention for cosine similarity
+        (1 / (1 + cosine distance)) so that results are interchangeable with
+        the ones produced by the search service.
+        """
+        if len(query_vectors) == 0:
+            return []
+        if not self.documents:
+            return [[] for _ in query_vectors]
+
+        queries = normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+
+        similarities = queries @ self.vectors.T
+        k = min(k, similarities.shape[1])
+        top_k = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_k_scores = np.take_along_axis(similarities, top_k, axis=1)
+        order = np.argsort(-top_k_scores, axis=1, kind="stable")
+        top_k = np.take_along_axis(top_k, order, axis=1)
+        top_k_scores = np.take_along_axis(top_k_scores, order, axis=1)
+
+        return [
+            [
+                {**self.documents[doc_idx], "score": float(1.0 / (2.0 - score))}
+                for doc_idx, score in zip(row_indices, row_scores)
+            ]
+            for row_indices, row_scores in zip(top_k, top_k_scores)
+        ]
+
+
+def normalize_rows(vectors):
+    """Scale every row to unit length, leaving zero rows untouched."""
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,183 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate.
+
+    Reservations may drive the level below zero; the caller then has to wait
+    until the deficit has been refilled. This keeps waiting callers in FIFO
+    order and allows single requests that are larger than the bucket.
+    """
+
+    def __init__(self, rate_per_minute, now, burst_seconds=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """Take amount from the bucket and return the seconds to wait before using it."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount):
+        self.level -= amount
+
+
+def create_shared_state():
+    """Return shared memory for the budget of one deployment.
+
+    Limiters in several processes that are given the same state, e.g.
+    through the initializer of a process pool, draw from one budget: a
+    process that is alone uses all of it, and a rate limit error seen by
+    one process holds back all of them.
+    """
+    import multiprocessing
+
+    return multiprocessing.Array("d", RateLimiter.SHARED_STATE_SIZE)
+
+
+class RateLimiter:
+    """Keeps requests to one deployment within its requests and tokens per minute.
+
+    Requests that are answered with a rate limit error are retried after the
+    delay the service asked for; until then all requests through this limiter
+    are held back. With a shared_state from create_shared_state the budget is
+    shared with the limiters of other processes; the counters stay per limiter.
+    """
+
+    # Bucket levels and update times, the back-off deadline and whether the state is initialized
+    SHARED_STATE_SIZE = 6
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=6,
+                 clock=time.monotonic, sleep=time.sleep, shared_state=None):
+        now = clock()
+        self._requests = TokenBucket(requests_per_minute, now) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, now) if tokens_per_minute else None
+        self._blocked_until = now
+        self._lock = threading.Lock()
+        self._shared_state = shared_state
+        if shared_state is not None:
+            with shared_state.get_lock():
+                if not shared_state[5]:
+                    self._store_state()
+        self._clock = clock
+        self._sleep = sleep
+        self.max_retries = max_retries
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+        self.failed_attempts = 0
+        self.retries = 0
+
+    def acquire(self, tokens):
+        """Block until a request estimated at the given number of tokens may be sent."""
+        with self._budget():
+            now = self._clock()
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            self.requests += 1
+            if wait > 0:
+                self.throttled_requests += 1
+                self.throttled_seconds += wait
+        if wait > 0:
+            self._sleep(wait)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token budget once the actual usage of a request is known."""
+        if self._tokens is not None and actual_tokens is not None:
+            with self._budget():
+                self._tokens.adjust(actual_tokens - estimated_tokens)
+
+    def back_off(self, seconds, rate_limited=True, refund_tokens=0):
+        """Hold back all requests for seconds after a failed attempt.
+
+        rate_limited tells a rate limit error apart from other retryable
+        failures such as server or connection errors in the stats, and
+        refund_tokens returns the token estimate of the failed attempt.
+        """
+        with self._budget():
+            if rate_limited:
+                self.rate_limited += 1
+            else:
+                self.failed_attempts += 1
+            if self._tokens is not None:
+                self._tokens.adjust(-refund_tokens)
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+    def call(self, fn, tokens, retry_after, count_tokens=None):
+        """Call fn within the budget, retrying when it fails with a retryable error.
+
+        retry_after maps an exception to the delay in seconds requested by the
+        service (0 to back off exponentially), or None if the exception is not
+        retryable and must be raised. Exceptions with status_code 429 count as
+        rate limited, all others as failed attempts.
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as error:
+                delay = retry_after(error)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                self.back_off(
+                    delay if delay > 0 else min(60.0, 2.0 ** attempt),
+                    rate_limited=getattr(error, "status_code", None) == 429,
+                    refund_tokens=tokens,
+                )
+                with self._lock:
+                    self.retries += 1
+                attempt += 1
+                continue
+            if count_tokens is not None:
+                self.record_usage(tokens, count_tokens(result))
+            return result
+
+    @contextmanager
+    def _budget(self):
+        """Lock the budget, reading it from and writing it back to the shared state if there is one."""
+        with self._lock:
+            if self._shared_state is None:
+                yield
+                return
+            with self._shared_state.get_lock():
+                self._load_state()
+                yield
+                self._store_state()
+
+    def _load_state(self):
+        state = self._shared_state
+        if self._requests is not None:
+            self._requests.level, self._requests.updated = state[0], state[1]
+        if self._tokens is not None:
+            self._tokens.level, self._tokens.updated = state[2], state[3]
+        self._blocked_until = state[4]
+
+    def _store_state(self):
+        state = self._shared_state
+        if self._requests is not None:
+            state[0], state[1] = self._requests.level, self._requests.updated
+        if self._tokens is not None:
+            state[2], state[3] = self._tokens.level, self._tokens.updated
+        state[4] = self._blocked_until
+        state[5] = 1.0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "throttled_requests": self.throttled_requests,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "failed_attempts": self.failed_attempts,
+            "retries": self.retries,
+        }
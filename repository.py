@@ -1,6 +1,15 @@
+import hashlib
 import json
 import os
-from tqdm import tqdm
+import threading
+import numpy as np
+
+def fingerprint_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 class Repository:
 
@@ -25,6 +34,8 @@ class Repository:
         
         # Validating that the script ID is a two-digit number
         self.get_script_id()
+        self._manifest_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
         
     def get_transcript_file(self):
         return self._transcript_file
@@ -45,8 +56,7 @@ class Repository:
     def save_lectored_output(self, lectored_output):
         lectored_output_file = self.__get_lectored_output_file()
         print(f"Writing lectored output to file {lectored_output_file}")
-        with open(lectored_output_file, "w", encoding="utf-8") as f:
-            f.write(lectored_output)
+        self.__write_atomically(lectored_output_file, lambda f: f.write(lectored_output))
     
     def read_lectored_output(self):
         lectored_output_file = self.__get_lectored_output_file()
@@ -57,23 +67,47 @@ class Repository:
     
     def save_json_script(self, json_script):
         json_script_file = self.__get_json_script_file()
-        with open(json_script_file, 'w', encoding='utf-8') as json_file:
-            json.dump(json_script, json_file, ensure_ascii=False, indent=4)
+        json_script = {
+            **json_script,
+            "content": self.__save_embeddings(json_script["content"], self.__get_script_embeddings_file())
+        }
+        self.__write_atomically(
+            json_script_file, lambda json_file: json.dump(json_script, json_file, ensure_ascii=False, indent=4)
+        )
         return json
     
+    def save_lectored_chunks(self, lectored_chunks):
+        self.__write_atomically(
+            self.__get_lectored_chunks_file(), lambda f: json.dump(lectored_chunks, f, ensure_ascii=False, indent=4)
+        )
+
+    def read_lectored_chunks(self):
+        lectored_chunks_file = self.__get_lectored_chunks_file()
+        if not os.path.exists(lectored_chunks_file):
+            return []
+        with open(lectored_chunks_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
     def read_json_script(self):
         json_script_file = self.__get_json_script_file()
         if not os.path.exists(json_script_file):
             return None
         with open(json_script_file, 'r', encoding='utf-8') as file:
             return json.load(file)
+
+    def read_script_embeddings(self, json_script=None):
+        """Return the paragraph embeddings as a matrix in the order of the script content."""
+        json_script = json_script or self.read_json_script()
+        if json_script is None:
+            return None
+        return self.__read_embeddings(json_script["content"])
             
-    def save_slides(self, slides):
-        slides_folder = self.__get_slides_folder()
-        print(f"Saving {len(slides)} slide images to {slides_folder}")
-        for i, slide in enumerate(tqdm(slides, desc="Saving slide images")):
-            slide.save(f'{slides_folder}/page_{i + 1:03d}.png', 'PNG')
-        return self.load_slides()
+    def get_slide_file(self, page_number):
+        return os.path.join(self.__get_slides_folder(), f'page_{page_number:03d}.png')
+
+    def clear_slides(self):
+        for slide_file in self.load_slides():
+            os.remove(slide_file)
 
     def load_slides(self):
         slides = []
@@ -86,8 +120,10 @@ class Repository:
     def save_slide_descriptions(self, descriptions):
         slide_descriptions_file = self.__get_slide_descriptions_file()
         print(f"Writing slide description to file {slide_descriptions_file}")
-        with open(slide_descriptions_file, "w", encoding="utf-8") as f:
-            json.dump(descriptions, f, indent=4, ensure_ascii=False)
+        descriptions = self.__save_embeddings(descriptions, self.__get_slide_embeddings_file())
+        self.__write_atomically(
+            slide_descriptions_file, lambda f: json.dump(descriptions, f, indent=4, ensure_ascii=False)
+        )
     
     def read_slide_descriptions(self):
         slide_descriptions_file = self.__get_slide_descriptions_file()
@@ -96,13 +132,20 @@ class Repository:
         print(f"Reading slide descriptions from file {slide_descriptions_file}")
         with open(slide_descriptions_file, 'r', encoding='utf-8') as file:
             return json.load(file)
-            
+
+    def read_slide_embeddings(self, descriptions=None):
+        """Return the slide description embeddings as a matrix in slide order."""
+        descriptions = descriptions or self.read_slide_descriptions()
+        if descriptions is None:
+            return None
+        return self.__read_embeddings(descriptions)
     
     def save_slide_matches(self, matches):
         slide_matches_file = self.__get_slide_matches_file()
         print(f"Writing slide match to file {slide_matches_file}")
-        with open(slide_matches_file, 'w', encoding='utf-8') as outfile:
-            json.dump(matches, outfile, ensure_ascii=False, indent=4)
+        self.__write_atomically(
+            slide_matches_file, lambda outfile: json.dump(matches, outfile, ensure_ascii=False, indent=4)
+        )
             
     def read_slide_matches(self):
         slide_matches_file = self.__get_slide_matches_file()
@@ -112,6 +155,165 @@ class Repository:
         with open(slide_matches_file, 'r', encoding='utf-8') as file:
             return json.load(file)
 
+    def read_fingerprints(self, stage, adopt=None):
+        """Return the item fingerprints recorded for a stage, or None if the stage never ran.
+
+        Outputs created before fingerprints were recorded can be adopted: if
+        the stage has no fingerprints yet, the ones passed as adopt are
+        recorded and returned as if the stage had produced them.
+        """
+        with self._manifest_lock:
+            fingerprints = self.__read_manifest().get(stage)
+        if fingerprints is None and adopt is not None:
+            self.save_fingerprints(stage, adopt)
+            return adopt
+        return fingerprints
+
+    def save_fingerprints(self, stage, fingerprints):
+        """Record the fingerprints of the inputs a stage produced its items from."""
+        with self._manifest_lock:
+            manifest = self.__read_manifest()
+            manifest[stage] = fingerprints
+            self.__write_atomically(
+                self.__get_manifest_file(), lambda f: json.dump(manifest, f, ensure_ascii=False, indent=4)
+            )
+
+    def save_trace(self, trace):
+        trace_file = self.__get_trace_file()
+        print(f"Writing trace to file {trace_file}")
+        self.__write_atomically(trace_file, lambda f: json.dump(trace, f, ensure_ascii=False, indent=4))
+
+    def append_journal(self, stage, key, fingerprint, result):
+        """Record a completed item of a stage as soon as it is done.
+
+        The journal is append-only, so the items finished before a run was
+        interrupted are available to the next run.
+        """
+        entry = json.dumps({"key": key, "fingerprint": fingerprint, "result": result}, ensure_ascii=False)
+        with self._journal_lock:
+            with open(self.__get_journal_file(stage), "ab+") as f:
+                # Start a new line after an entry that a crash left incomplete
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write((entry + "\n").encode("utf-8"))
+
+    def read_journal(self, stage):
+        """Return the journaled items of a stage as {key: (fingerprint, result)}.
+
+        A line left incomplete by a crash is ignored; for items journaled more
+        than once the last entry wins.
+        """
+        journal_file = self.__get_journal_file(stage)
+        if not os.path.exists(journal_file):
+            return {}
+        items = {}
+        with self._journal_lock, open(journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                items[entry["key"]] = (entry["fingerprint"], entry["result"])
+        return items
+
+    def clear_journal(self, stage):
+        """Remove the journal of a stage once its results have been saved."""
+        with self._journal_lock:
+            journal_file = self.__get_journal_file(stage)
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
+
+    def get_batch_file(self, stage, kind):
+        """Return the path of the JSONL file with the batch job requests ("input") or results ("output") of a stage."""
+        return os.path.join(self.__get_batch_folder(), f'{stage}.{kind}.jsonl')
+
+    def save_batch_job(self, stage, job):
+        self.__write_atomically(
+            self.__get_batch_job_file(stage), lambda f: json.dump(job, f, ensure_ascii=False, indent=4)
+        )
+
+    def read_batch_job(self, stage):
+        batch_job_file = self.__get_batch_job_file(stage)
+        if not os.path.exists(batch_job_file):
+            return None
+        with open(batch_job_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def clear_batch_job(self, stage):
+        """Remove the job record and the request and result files of a stage's batch job."""
+        for batch_file in [self.__get_batch_job_file(stage), self.get_batch_file(stage, "input"),
+                           self.get_batch_file(stage, "output")]:
+            if os.path.exists(batch_file):
+                os.remove(batch_file)
+
+    def __write_atomically(self, path, write, binary=False):
+        """Write a file through a temporary file, so it is either complete or unchanged."""
+        temporary_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if binary:
+                with open(temporary_file, "wb") as f:
+                    write(f)
+            else:
+                with open(temporary_file, "w", encoding="utf-8") as f:
+                    write(f)
+            os.replace(temporary_file, path)
+        finally:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+    def __read_manifest(self):
+        manifest_file = self.__get_manifest_file()
+        if not os.path.exists(manifest_file):
+            return {}
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def __save_embeddings(self, items, embeddings_file):
+        """Move the embeddings of the items into a float32 .npy sidecar file.
+
+        Returns copies of the items that reference their row in the sidecar
+        instead of carrying the vector inline.
+        """
+        # Copy before saving, the current vectors may be memory-mapped from the same file
+        vectors = np.array(self.__read_embeddings(items), dtype=np.float32)
+        self.__write_atomically(embeddings_file, lambda f: np.save(f, vectors), binary=True)
+        file_name = os.path.basename(embeddings_file)
+        stored_items = []
+        for row, item in enumerate(items):
+            stored_item = {key: value for key, value in item.items() if key not in ("embeddings", "embeddings_ref")}
+            stored_item["embeddings_ref"] = {"file": file_name, "row": row}
+            stored_items.append(stored_item)
+        return stored_items
+
+    def __read_embeddings(self, items):
+        """Collect the embeddings of the items, reading both inline vectors and sidecar references."""
+        if not items:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        if all("embeddings_ref" in item for item in items):
+            files = {item["embeddings_ref"]["file"] for item in items}
+            if len(files) == 1:
+                vectors = np.load(os.path.join(self.folder_name, files.pop()), mmap_mode='r')
+                rows = [item["embeddings_ref"]["row"] for item in items]
+                if rows == list(range(len(vectors))):
+                    return vectors
+                return np.asarray(vectors[rows])
+
+        sidecars = {}
+        vectors = []
+        for item in items:
+            if "embeddings" in item:
+                vectors.append(item["embeddings"])
+                continue
+            reference = item["embeddings_ref"]
+            if reference["file"] not in sidecars:
+                sidecar_file = os.path.join(self.folder_name, reference["file"])
+                sidecars[reference["file"]] = np.load(sidecar_file)
+            vectors.append(sidecars[reference["file"]][reference["row"]])
+        return np.asarray(vectors, dtype=np.float32)
+
     def __get_slides_folder(self):
         slides_folder = os.path.join(self.folder_name, 'slides')
         if not os.path.exists(slides_folder):
@@ -121,9 +323,39 @@ class Repository:
     def __get_json_script_file(self):
         return os.path.join(self.folder_name, "script.json")
 
+    def __get_script_embeddings_file(self):
+        return os.path.join(self.folder_name, "script_embeddings.npy")
+
+    def __get_slide_embeddings_file(self):
+        return os.path.join(self.folder_name, "slide_embeddings.npy")
+
     def __get_slide_descriptions_file(self):
         return os.path.join(self.folder_name, 'slide_descriptions.json')
     
+    def __get_manifest_file(self):
+        return os.path.join(self.folder_name, 'manifest.json')
+
+    def __get_journal_file(self, stage):
+        journal_folder = os.path.join(self.folder_name, 'journal')
+        if not os.path.exists(journal_folder):
+            os.makedirs(journal_folder, exist_ok=True)
+        return os.path.join(journal_folder, f'{stage}.jsonl')
+
+    def __get_batch_folder(self):
+        batch_folder = os.path.join(self.folder_name, 'batch')
+        if not os.path.exists(batch_folder):
+            os.makedirs(batch_folder, exist_ok=True)
+        return batch_folder
+
+    def __get_batch_job_file(self, stage):
+        return os.path.join(self.__get_batch_folder(), f'{stage}.job.json')
+
+    def __get_trace_file(self):
+        return os.path.join(self.folder_name, 'trace.json')
+
+    def __get_lectored_chunks_file(self):
+        return os.path.join(self.folder_name, 'script_chunks.json')
+
     def __get_slide_matches_file(self):
         return os.path.join(self.folder_name, 'slide_matches.json')
             
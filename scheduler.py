@@ -0,0 +1,70 @@
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    """A pipeline stage together with the artifacts it reads and writes."""
+
+    def __init__(self, name, run, inputs=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+def stage_dependencies(stages):
+    """Map every stage name to the names of the stages that produce its inputs.
+
+    Inputs that no stage produces are expected to exist already, e.g. the
+    input files or artifacts of an earlier run.
+    """
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[output] = stage.name
+    return {
+        stage.name: {
+            producers[artifact] for artifact in stage.inputs
+            if artifact in producers and producers[artifact] != stage.name
+        }
+        for stage in stages
+    }
+
+
+def run_stages(stages, run_stage, max_workers=2):
+    """Run every stage as soon as the stages producing its inputs have finished.
+
+    run_stage(stage) is called in a worker thread, in a copy of the caller's
+    context, with at most max_workers stages running at the same time. Once a
+    stage fails no further stages are started; the running stages are
+    awaited and the first error is raised.
+    """
+    dependencies = stage_dependencies(stages)
+    pending = list(stages)
+    finished = set()
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            if error is None:
+                for stage in [stage for stage in pending if dependencies[stage.name] <= finished]:
+                    pending.remove(stage)
+                    future = executor.submit(contextvars.copy_context().run, run_stage, stage)
+                    running[future] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    future.result()
+                    finished.add(stage.name)
+                except BaseException as e:
+                    error = error or e
+    if error is not None:
+        raise error
+    if pending:
+        raise ValueError(f"Stages with circular dependencies: {', '.join(stage.name for stage in pending)}")
@@ -1,25 +1,48 @@
-import tqdm    
+import tqdm
 import os
+import config as cfg
+from matching.alignment import align_slides, similarity_matrix
 
-def find_slide_match(slide_matches, slide, current_paragraph_id):
-    for slide_match in slide_matches:
-        if slide_match['slide_file'] == slide:
-            match_results = slide_match['results']
-            match_results = [result for result in match_results if int(result['paragraph_id']) > current_paragraph_id]
-            if len(match_results) == 0:
-                return current_paragraph_id + 1
-            else:
-                match = min(match_results, key=lambda x: int(x['paragraph_id']))
-                return int(match['paragraph_id'])-1
-    raise ValueError(f"Slide {slide} not found in slide matches")
+def find_slide_match(slide_matches_by_file, slide, current_paragraph_id):
+    if slide not in slide_matches_by_file:
+        raise ValueError(f"Slide {slide} not found in slide matches")
+    match_results = slide_matches_by_file[slide]['results']
+    match_results = [result for result in match_results if int(result['paragraph_id']) > current_paragraph_id]
+    if len(match_results) == 0:
+        return current_paragraph_id + 1
+    else:
+        match = min(match_results, key=lambda x: int(x['paragraph_id']))
+        return int(match['paragraph_id'])-1
+
+def find_slide_boundaries(slide_matches, slides):
+    """Greedily place every slide before its first top match after the previous slide."""
+    slide_matches_by_file = {slide_match['slide_file']: slide_match for slide_match in slide_matches}
+    boundaries = []
+    current_paragraph_idx = 0
+    for slide in slides:
+        current_paragraph_idx = find_slide_match(slide_matches_by_file, slide, current_paragraph_idx+1)
+        boundaries.append(current_paragraph_idx)
+    return boundaries
+
+def align_slide_boundaries(output_folder, script, paragraph_order, slides):
+    """Place every slide by a global, order-preserving alignment with the script."""
+    descriptions = output_folder.read_slide_descriptions()
+    slide_rows = {description['slide_file']: row for row, description in enumerate(descriptions)}
+    slide_embeddings = output_folder.read_slide_embeddings(descriptions)[[slide_rows[slide] for slide in slides]]
+    paragraph_embeddings = output_folder.read_script_embeddings(script)[paragraph_order]
+    return align_slides(similarity_matrix(slide_embeddings, paragraph_embeddings))
 
 def generate_script(output_folder):
     print("Generating script...")
-    
+
     script = output_folder.read_json_script()
-    paragraphs = sorted(script['content'], key=lambda x: x['id'])
+    paragraph_order = sorted(range(len(script['content'])), key=lambda idx: script['content'][idx]['id'])
+    paragraphs = [script['content'][idx] for idx in paragraph_order]
     slides = output_folder.load_slides()
-    slide_matches = output_folder.read_slide_matches()
+    if cfg.slide_alignment == "global":
+        boundaries = align_slide_boundaries(output_folder, script, paragraph_order, slides[1:])
+    else:
+        boundaries = find_slide_boundaries(output_folder.read_slide_matches(), slides[1:])
     output_file_path = output_folder.get_script_file()
     # paragraph ID is 1-based, index is 0-based
     current_paragraph_idx, next_paragraph_idx = 0, 0
@@ -27,20 +50,19 @@ def generate_script(output_folder):
         writer.write(":imagesdir: slides\n\n")
         writer.write(f"image::{os.path.basename(slides[0])}[]\n\n")
         slides = slides[1:]
-        
+
         progress_bar = tqdm.tqdm(total=len(slides), desc="Inserting slides into script")
-        
-        for slide in slides:
-            next_paragraph_idx = find_slide_match(slide_matches, slide, current_paragraph_idx+1)
+
+        for slide, next_paragraph_idx in zip(slides, boundaries):
             for paragraph in paragraphs[current_paragraph_idx:next_paragraph_idx]:
                 writer.write(f"{paragraph['text']}\n\n")
             writer.write(f"image::{os.path.basename(slide)}[]\n\n")
             current_paragraph_idx = next_paragraph_idx
             progress_bar.update(1)
-            
+
         progress_bar.close()
-        
+
         for paragraph in paragraphs[current_paragraph_idx:]:
             writer.write(f"{paragraph['text']}\n\n")
-        
-        print(f"Script generated at {output_file_path}")
\ No newline at end of file
+
+        print(f"Script generated at {output_file_path}")
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from matching.alignment import align_slides, similarity_matrix
+
+
+class AlignmentTest(unittest.TestCase):
+    def test_similarity_matrix_is_cosine(self):
+        similarities = similarity_matrix([[2.0, 0.0], [1.0, 1.0]], [[1.0, 0.0], [0.0, 3.0]])
+
+        np.testing.assert_allclose(similarities, [[1.0, 0.0], [0.7071068, 0.7071068]], rtol=1e-6)
+
+    def test_picks_best_paragraph_for_every_slide(self):
+        similarities = np.array([
+            [0.9, 0.1, 0.1, 0.1],
+            [0.1, 0.1, 0.8, 0.1],
+            [0.1, 0.1, 0.1, 0.7],
+        ])
+
+        self.assertEqual(align_slides(similarities), [0, 2, 3])
+
+    def test_preserves_slide_order(self):
+        # The second slide matches an earlier paragraph best, but must not move before the first slide
+        similarities = np.array([
+            [0.1, 0.1, 0.9, 0.1],
+            [0.8, 0.1, 0.1, 0.2],
+            [0.1, 0.1, 0.1, 0.9],
+        ])
+
+        boundaries = align_slides(similarities)
+
+        self.assertEqual(boundaries, sorted(boundaries))
+        self.assertEqual(boundaries, [2, 3, 3])
+
+    def test_maximizes_total_similarity(self):
+        # Greedily taking paragraph 3 for the first slide would leave nothing good for the second one
+        similarities = np.array([
+            [0.5, 0.1, 0.1, 0.6],
+            [0.1, 0.9, 0.1, 0.1],
+        ])
+
+        self.assertEqual(align_slides(similarities), [0, 1])
+
+    def test_empty_inputs(self):
+        self.assertEqual(align_slides(np.zeros((0, 5))), [])
+        self.assertEqual(align_slides(np.zeros((2, 0))), [0, 0])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+import batch_jobs
+from repository import Repository
+
+
+class EchoChatModel:
+    """Answers every request with its last message, failing for requests containing "fail"."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def invoke(self, messages):
+        self.requests += 1
+        if "fail" in messages[-1].content:
+            raise RuntimeError("Simulated failure")
+        return AIMessage(content=f" {messages[-1].content} ", usage_metadata={
+            "input_tokens": 3, "output_tokens": 2, "total_tokens": 5,
+        })
+
+
+class TestBatchJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output_folder = os.path.join("output", os.path.basename(self.test_dir))
+        for extension in ("docx", "pdf"):
+            with open(os.path.join(self.test_dir, f"99_test.{extension}"), "w") as f:
+                f.write("dummy content")
+        self.repository = Repository(self.test_dir)
+        self.chat_model = EchoChatModel()
+        self.backend = batch_jobs.LocalBatchBackend(os.path.join(self.test_dir, "jobs"), chat_model=self.chat_model)
+        self.requests = {
+            "chunk_001": [SystemMessage(content="system"), HumanMessage(content="first")],
+            "chunk_002": [SystemMessage(content="system"), HumanMessage(content="please fail")],
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.output_folder)
+
+    def run_batch(self):
+        return batch_jobs.run_batch(
+            self.repository, "lector", self.requests, deployment="gpt-4o", backend=self.backend,
+            poll_interval=0, timeout=10,
+        )
+
+    def test_writes_chat_completion_requests(self):
+        path = os.path.join(self.test_dir, "requests.jsonl")
+        batch_jobs.write_requests(path, self.requests, "gpt-4o-batch")
+
+        with open(path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f]
+        self.assertEqual([request["custom_id"] for request in requests], ["chunk_001", "chunk_002"])
+        self.assertEqual(requests[0]["url"], "/chat/completions")
+        self.assertEqual(requests[0]["body"]["model"], "gpt-4o-batch")
+        self.assertEqual(requests[0]["body"]["messages"], [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "first"},
+        ])
+
+    def test_returns_answered_requests(self):
+        self.assertEqual(self.run_batch(), {"chunk_001": " first "})
+        self.assertIsNone(self.repository.read_batch_job("lector"))
+        self.assertFalse(os.path.exists(self.repository.get_batch_file("lector", "input")))
+
+    def test_resumes_submitted_job(self):
+        batch_jobs.write_requests(self.repository.get_batch_file("lector", "input"), self.requests, "gpt-4o")
+        job_id = self.backend.submit(self.repository.get_batch_file("lector", "input"))
+        self.repository.save_batch_job("lector", {
+            "backend": "local",
+            "id": job_id,
+            "input": batch_jobs.fingerprint_file(self.repository.get_batch_file("lector", "input")),
+        })
+
+        self.assertEqual(self.run_batch(), {"chunk_001": " first "})
+        self.assertEqual(len([name for name in os.listdir(self.backend.folder) if name.endswith(".input.jsonl")]), 1)
+        self.assertEqual(self.chat_model.requests, 2)
+
+    def test_no_requests(self):
+        self.assertEqual(batch_jobs.run_batch(self.repository, "lector", {}, backend=self.backend), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
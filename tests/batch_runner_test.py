@@ -0,0 +1,78 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from batch_runner import expand_inputs, print_summary
+
+
+class ExpandInputsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_dir = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        for script_id in ("01", "02", "10"):
+            os.makedirs(os.path.join("input", script_id))
+        with open(os.path.join("input", "notes.txt"), "w") as f:
+            f.write("not a lecture")
+
+    def tearDown(self):
+        os.chdir(self.previous_dir)
+        shutil.rmtree(self.test_dir)
+
+    def test_expands_ids_and_globs_in_order(self):
+        self.assertEqual(
+            expand_inputs(["10", "input/0*"]),
+            [os.path.join("input", "10"), os.path.join("input", "01"), os.path.join("input", "02")],
+        )
+
+    def test_skips_duplicates(self):
+        self.assertEqual(
+            expand_inputs(["01", "input/01/", "input/0*", "01"]),
+            [os.path.join("input", "01"), os.path.join("input", "02")],
+        )
+
+    def test_skips_missing_folders_and_files(self):
+        self.assertEqual(expand_inputs(["99", "input/9*", "input/*.txt"]), [])
+        self.assertEqual(expand_inputs(["input/*"]), [
+            os.path.join("input", "01"), os.path.join("input", "02"), os.path.join("input", "10"),
+        ])
+
+
+class PrintSummaryTest(unittest.TestCase):
+
+    def summary(self, results):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            print_summary(results, ["lector", "interpret"])
+        return output.getvalue().splitlines()
+
+    def test_prints_aligned_table(self):
+        lines = self.summary([
+            {"input": "input/01", "timings": {"lector": 12.34, "interpret": 5.0}, "total": 17.5, "error": None},
+            {"input": "input/102", "timings": {"lector": 1.0}, "total": 1.25, "error": None},
+        ])
+
+        self.assertEqual(lines, [
+            "",
+            "lecture  lector  interpret  total  status",
+            "01       12.3s   5.0s       17.5s  ok    ",
+            "102      1.0s    -          1.2s   ok    ",
+        ])
+
+    def test_reports_failures(self):
+        lines = self.summary([
+            {"input": "input/01", "timings": {"lector": 2.0}, "total": 2.0, "error": "RuntimeError: Simulated failure"},
+            {"input": "input/02", "timings": {"lector": 1.0, "interpret": 1.0}, "total": 2.0, "error": None},
+        ])
+
+        self.assertEqual(lines[2], "01       2.0s    -          2.0s   FAILED")
+        self.assertEqual(lines[3], "02       1.0s    1.0s       2.0s   ok    ")
+        self.assertEqual(lines[4:], ["", "01 failed: RuntimeError: Simulated failure"])
+
+
+if __name__ == '__main__':
+    unittest.main()
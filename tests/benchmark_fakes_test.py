@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from azure.search.documents.models import VectorizedQuery
+
+from benchmarks import fakes, inputs
+from benchmarks.run import MemorySampler, process_tree_memory_mb
+
+
+class TestFakeServices(unittest.TestCase):
+
+    def test_chat_echoes_current_paragraphs(self):
+        chat = fakes.FakeChatModel()
+        response = chat.invoke([
+            SystemMessage(content="system"),
+            HumanMessage(content="REFERENCE_PREVIOUS:\n<none>\n\nCURRENT:\nfirst\nsecond"),
+        ])
+        self.assertEqual(response.content, "first\n\nsecond")
+        self.assertGreater(response.usage_metadata["input_tokens"], 0)
+
+    def test_failure_injection_is_deterministic(self):
+        def failures(seed):
+            service = fakes.FakeService(failure_rate=0.3, seed=seed)
+            outcomes = []
+            for _ in range(50):
+                try:
+                    service.request()
+                    outcomes.append(False)
+                except fakes.FakeRateLimitError as error:
+                    self.assertEqual(error.status_code, 429)
+                    outcomes.append(True)
+            return outcomes
+
+        self.assertEqual(failures(7), failures(7))
+        self.assertTrue(any(failures(7)))
+
+    def test_embeddings_are_deterministic_unit_vectors(self):
+        embeddings = fakes.FakeEmbeddings(dimensions=8)
+        first, second = embeddings.embed_documents(["a", "b"])
+        self.assertEqual(first, embeddings.embed_query("a"))
+        self.assertNotEqual(first, second)
+        self.assertAlmostEqual(sum(value * value for value in first), 1.0)
+
+    def test_search_filters_by_file_id_and_ranks_by_similarity(self):
+        search_client = fakes.FakeSearchClient()
+        with fakes.FakeBufferedSender(search_client, initial_batch_action_count=2) as sender:
+            sender.merge_or_upload_documents(documents=[
+                {"vector_id": "01_1", "file_id": "01", "paragraph_id": "1", "text": "x", "content_vector": [1.0, 0.0]},
+                {"vector_id": "01_2", "file_id": "01", "paragraph_id": "2", "text": "y", "content_vector": [0.0, 1.0]},
+                {"vector_id": "02_1", "file_id": "02", "paragraph_id": "1", "text": "z", "content_vector": [0.0, 1.0]},
+            ])
+
+        results = search_client.search(
+            vector_queries=[VectorizedQuery(vector=[0.1, 1.0], k_nearest_neighbors=3, fields="content_vector")],
+            filter="file_id eq '01'",
+            select=["paragraph_id"],
+        )
+        self.assertEqual([result["paragraph_id"] for result in results], ["2", "1"])
+        self.assertEqual(search_client.search(search_text="*", filter="file_id eq '02'",
+                                              include_total_count=True, top=0).get_count(), 1)
+
+
+class TestSyntheticInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_slides_pdf_has_requested_pages(self):
+        pdf_path = os.path.join(self.folder, "slides.pdf")
+        inputs.write_slides_pdf(pdf_path, pages=25)
+        self.assertEqual(fakes.count_pdf_pages(pdf_path), 25)
+        with open(pdf_path, "rb") as pdf:
+            self.assertTrue(pdf.read().rstrip().endswith(b"%%EOF"))
+
+    def test_transcript_has_requested_paragraphs(self):
+        from docx import Document
+
+        docx_path = os.path.join(self.folder, "transcript.docx")
+        inputs.write_transcript(docx_path, paragraphs=12)
+        self.assertEqual(len(Document(docx_path).paragraphs), 12)
+
+
+@unittest.skipIf(process_tree_memory_mb() is None, "needs /proc")
+class TestMemorySampler(unittest.TestCase):
+
+    def test_stage_peak_includes_child_processes(self):
+        with MemorySampler(interval=0.01) as sampler:
+            with sampler.stage("idle"):
+                pass
+            with sampler.stage("render"):
+                child = subprocess.Popen(
+                    [sys.executable, "-c", "data = bytearray(64 * 2**20); print('ready', flush=True); input()"],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                )
+                try:
+                    self.assertEqual(child.stdout.readline().strip(), "ready")
+                    sampler.sample()
+                finally:
+                    child.communicate("")
+
+        self.assertGreater(sampler.stage_peaks_mb["render"], sampler.stage_peaks_mb["idle"] + 50)
+        self.assertEqual(sampler.peak_mb, sampler.stage_peaks_mb["render"])
+
+
+if __name__ == "__main__":
+    unittest.main()
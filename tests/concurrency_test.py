@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+
+from concurrency import locked_cache, map_ordered
+
+
+class MapOrderedTest(unittest.TestCase):
+    def test_keeps_input_order(self):
+        def slow_identity(value):
+            time.sleep(0.01 * (5 - value))
+            return value
+
+        self.assertEqual(map_ordered(slow_identity, range(5), max_workers=5), [0, 1, 2, 3, 4])
+
+    def test_limits_calls_in_flight(self):
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def track(value):
+            with lock:
+                in_flight.append(value)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(value)
+            return value
+
+        map_ordered(track, range(10), max_workers=3)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_propagates_errors(self):
+        def fail_on_three(value):
+            if value == 3:
+                raise RuntimeError("boom")
+            return value
+
+        with self.assertRaises(RuntimeError):
+            map_ordered(fail_on_three, range(5), max_workers=2)
+
+
+class LockedCacheTest(unittest.TestCase):
+    def test_creates_value_once_for_concurrent_callers(self):
+        created = []
+
+        @locked_cache
+        def get_limiter(deployment):
+            created.append(deployment)
+            time.sleep(0.05)
+            return object()
+
+        barrier = threading.Barrier(4)
+
+        def get(_):
+            barrier.wait()
+            return get_limiter("gpt-4o")
+
+        limiters = map_ordered(get, range(4), max_workers=4)
+        self.assertEqual(created, ["gpt-4o"])
+        self.assertTrue(all(limiter is limiters[0] for limiter in limiters))
+
+        get_limiter.cache_clear()
+        self.assertIsNot(get_limiter("gpt-4o"), limiters[0])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from disk_cache import DiskCache, make_key
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = DiskCache(os.path.join(self.test_dir, "cache.sqlite"), max_bytes=30)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_counts_hits_and_misses(self):
+        self.cache.set("a", b"value")
+
+        self.assertEqual(self.cache.get("a"), b"value")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used_entries(self):
+        self.cache.set("a", b"0123456789")
+        self.cache.set("b", b"0123456789")
+        self.cache.get("a")
+        self.cache.set("c", b"0123456789")
+        self.cache.set("d", b"0123456789")
+
+        self.assertLessEqual(self.cache.size(), 30)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), b"0123456789")
+        self.assertEqual(self.cache.get("d"), b"0123456789")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_persists_between_instances(self):
+        self.cache.set_many({"a": b"1", "b": b"2"})
+        reopened = DiskCache(self.cache.path, max_bytes=30)
+        try:
+            self.assertEqual(reopened.get_many(["a", "b", "c"]), {"a": b"1", "b": b"2"})
+        finally:
+            reopened.close()
+
+    def test_key_depends_on_all_parts(self):
+        self.assertEqual(make_key("model", "text"), make_key("model", "text"))
+        self.assertNotEqual(make_key("model", "text"), make_key("other", "text"))
+        self.assertNotEqual(make_key("ab", "c"), make_key("a", "bc"))
+
+    def test_key_accepts_bytes(self):
+        self.assertEqual(make_key("a", b"b"), make_key("a", "b"))
+        self.assertNotEqual(make_key(b"a", b"b"), make_key(b"ab"))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from lectoring.doc_extractor import chunk_tail, concatenate_paragraphs
+
+
+class DocExtractorTest(unittest.TestCase):
+    def test_concatenate_paragraphs_respects_max_length(self):
+        chunks = concatenate_paragraphs(["aaaa", "bbbb", "cccc"], 9)
+        self.assertEqual(chunks, ["aaaa\nbbbb", "cccc"])
+
+    def test_concatenate_paragraphs_packs_by_custom_length(self):
+        words = lambda text: len(text.split())
+        chunks = concatenate_paragraphs(["a b c", "d e", "f g h i j k", "l"], 6, words)
+        self.assertEqual(chunks, ["a b c\nd e", "f g h i j k", "l"])
+
+    def test_concatenate_paragraphs_never_splits_long_paragraph(self):
+        chunks = concatenate_paragraphs(["short", "a much longer paragraph", "end"], 8)
+        self.assertEqual(chunks, ["short", "a much longer paragraph", "end"])
+
+    def test_chunk_tail_returns_last_paragraphs(self):
+        chunk = "one\ntwo\nthree\nfour"
+        self.assertEqual(chunk_tail(chunk, 3), "two\n\nthree\n\nfour")
+        self.assertEqual(chunk_tail("single", 3), "single")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from http_transport import create_http_client, create_requests_session
+
+
+class HttpTransportTest(unittest.TestCase):
+    def test_http_client_pool_and_timeouts(self):
+        client = create_http_client(pool_size=16, connect_timeout=5, read_timeout=90, keepalive_seconds=30)
+        try:
+            self.assertEqual(client.timeout.connect, 5)
+            self.assertEqual(client.timeout.read, 90)
+            pool = client._transport._pool
+            self.assertEqual(pool._max_connections, 16)
+            self.assertEqual(pool._max_keepalive_connections, 16)
+            self.assertEqual(pool._keepalive_expiry, 30)
+        finally:
+            client.close()
+
+    def test_requests_session_pool(self):
+        session = create_requests_session(pool_size=16)
+        try:
+            adapter = session.get_adapter("https://example.search.windows.net")
+            self.assertEqual(adapter._pool_maxsize, 16)
+            self.assertEqual(adapter._pool_connections, 16)
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,230 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from PIL import Image
+
+import config as cfg
+import embeddings
+import interpreting.slide_interpreter as slide_interpreter
+import lectoring.script_lector as script_lector
+import matching.script_search as script_search
+import matching.slide_script_matcher as slide_script_matcher
+from benchmarks import fakes
+from disk_cache import make_key
+from repository import Repository, fingerprint_file
+
+
+class RecordingChatModel:
+    """Echoes lector chunks and describes slides by their image, recording every request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def invoke(self, messages):
+        content = messages[-1].content
+        if isinstance(content, list):
+            image_url = content[0]["image_url"]["url"]
+            self.requests.append(image_url)
+            return AIMessage(content=f"Slide {image_url}")
+        current = content.split("CURRENT:\n", 1)[1]
+        self.requests.append(current)
+        return AIMessage(content="\n\n".join(current.split("\n")))
+
+
+def fake_embeddings(texts):
+    return [np.random.default_rng(int(make_key(text)[:8], 16)).standard_normal(8).tolist() for text in texts]
+
+
+def image_content(slide_file):
+    return {"type": "image_url", "image_url": {"url": fingerprint_file(slide_file)}}
+
+
+class IncrementalRebuildTest(unittest.TestCase):
+    """Editing, inserting or removing one item only sends that item to the services again."""
+
+    def setUp(self):
+        self.previous_dir = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.input_folder = os.path.join("input", "99")
+        os.makedirs(self.input_folder)
+        self.transcript_file = os.path.join(self.input_folder, "99_test.docx")
+        self.slides_file = os.path.join(self.input_folder, "99_test.pdf")
+        for path in (self.transcript_file, self.slides_file):
+            with open(path, "w") as f:
+                f.write("dummy content")
+        self.repository = Repository(self.input_folder)
+        self.chat_model = RecordingChatModel()
+
+        settings = {
+            "batch_enabled": False,
+            "lectoring_parallel": False,
+            "render_workers": 0,
+            "render_pages_per_task": 4,
+            "interpreting_dedupe": True,
+            "interpreting_dedupe_max_distance": 8,
+            "interpreting_slides_per_request": 1,
+            "interpreting_max_concurrency": 1,
+            "matching_backend": "local",
+        }
+        for patcher in [
+            mock.patch.dict(cfg.__dict__, settings),
+            mock.patch.object(embeddings, "generate_embeddings_batch", side_effect=fake_embeddings),
+            mock.patch.object(script_lector, "get_chat_model", return_value=self.chat_model),
+            mock.patch.object(script_lector, "load_prompt", return_value="system"),
+            mock.patch.object(script_lector, "estimate_tokens", side_effect=lambda text: len(text.split())),
+            mock.patch.object(script_lector, "_chunk_token_budget", return_value=23),
+            mock.patch.object(slide_interpreter, "get_chat_model", return_value=self.chat_model),
+            mock.patch.object(slide_interpreter, "load_prompt", return_value="system"),
+            mock.patch.object(slide_interpreter, "_image_content", side_effect=image_content),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.previous_dir)
+        shutil.rmtree(self.test_dir)
+
+    def lector(self, paragraphs):
+        with open(self.transcript_file, "w") as f:
+            f.write("\n".join(paragraphs))
+        self.chat_model.requests.clear()
+        with mock.patch.object(script_lector.de, "extract_paragraphs_from_docx", return_value=paragraphs):
+            script_lector.lector(self.repository)
+        return list(self.chat_model.requests)
+
+    def interpret(self, seeds):
+        """Interpret a deck whose pages are noise images drawn from the given seeds."""
+        with open(self.slides_file, "w") as f:
+            f.write(repr(seeds))
+
+        def extract_slides(pdf_path, get_slide_file, **kwargs):
+            for page_number, seed in enumerate(seeds, start=1):
+                pixels = np.random.default_rng(seed).integers(0, 256, (36, 64, 3), dtype=np.uint8)
+                Image.fromarray(pixels).save(get_slide_file(page_number), "PNG")
+            return [get_slide_file(page_number) for page_number in range(1, len(seeds) + 1)]
+
+        self.chat_model.requests.clear()
+        with mock.patch.object(slide_interpreter.extractor, "extract_slides", side_effect=extract_slides):
+            slide_interpreter.interpret_slides(self.repository)
+        return list(self.chat_model.requests)
+
+    def test_lector_sends_only_changed_chunks(self):
+        # Chunks of four paragraphs; the next chunk sees the last three of them as context
+        paragraphs = [f"paragraph {idx} of the lecture" for idx in range(12)]
+        self.assertEqual(len(self.lector(paragraphs)), 3)
+
+        paragraphs[4] = "edited paragraph of the lecture"
+        self.assertEqual(self.lector(paragraphs), ["\n".join(paragraphs[4:8])])
+        self.assertEqual(self.lector(paragraphs[:-1]), ["\n".join(paragraphs[8:11])])
+        self.assertEqual(self.repository.read_lectored_chunks(), [
+            "\n\n".join(paragraphs[0:4]), "\n\n".join(paragraphs[4:8]), "\n\n".join(paragraphs[8:11]),
+        ])
+
+    def test_interpret_reuses_moved_slides(self):
+        seeds = list(range(8))
+        self.assertEqual(len(self.interpret(seeds)), 8)
+
+        seeds.insert(3, 100)
+        self.assertEqual(self.interpret(seeds), [fingerprint_file(self.repository.get_slide_file(4))])
+        self.assertEqual(self.interpret(seeds[:1] + seeds[2:]), [])
+        self.assertEqual(self.interpret(seeds[:1] + seeds[2:]), [])
+
+        descriptions = self.repository.read_slide_descriptions()
+        self.assertEqual(len(descriptions), 8)
+        for description in descriptions:
+            self.assertEqual(description["description"], f"Slide {fingerprint_file(description['slide_file'])}")
+        self.assertEqual(len(self.repository.read_fingerprints("interpret")), 8)
+
+    def save_slides(self, descriptions):
+        self.repository.save_slide_descriptions([
+            {"slide_file": self.repository.get_slide_file(page_number), "description": description, "embeddings": vector}
+            for page_number, (description, vector) in enumerate(
+                zip(descriptions, fake_embeddings(descriptions)), start=1
+            )
+        ])
+
+    def test_match_reuses_moved_slides(self):
+        texts = [f"paragraph {idx}" for idx in range(6)]
+        self.repository.save_json_script({"id": "99", "content": [
+            {"id": idx + 1, "text": text, "embeddings": vector} for idx, (text, vector) in enumerate(
+                zip(texts, fake_embeddings(texts))
+            )
+        ]})
+        descriptions = [f"slide {idx}" for idx in range(5)]
+        self.save_slides(descriptions)
+        slide_script_matcher.match_slides_with_script(self.repository)
+        previous_results = {
+            description: match["results"]
+            for description, match in zip(descriptions, self.repository.read_slide_matches())
+        }
+
+        descriptions.insert(2, "inserted slide")
+        self.save_slides(descriptions)
+        with mock.patch.object(
+            slide_script_matcher, "match_slides_locally", wraps=slide_script_matcher.match_slides_locally
+        ) as match_slides_locally:
+            slide_script_matcher.match_slides_with_script(self.repository)
+
+        matched_slides = match_slides_locally.call_args.args[2]
+        self.assertEqual([slide["description"] for slide in matched_slides], ["inserted slide"])
+        matches = self.repository.read_slide_matches()
+        self.assertEqual(
+            [match["slide_file"] for match in matches],
+            [self.repository.get_slide_file(page_number) for page_number in range(1, 7)],
+        )
+        for description, match in zip(descriptions, matches):
+            if description in previous_results:
+                self.assertEqual(match["results"], previous_results[description])
+
+    def test_search_index_uploads_only_changed_paragraphs(self):
+        search_client = fakes.FakeSearchClient()
+        uploads = []
+
+        def index_documents(upload=(), delete=()):
+            uploads.append(([document["vector_id"] for document in upload], [document["vector_id"] for document in delete]))
+            fakes.FakeSearchClient.index_documents(search_client, upload, delete)
+
+        search_client.index_documents = index_documents
+        settings = {
+            "search_api_endpoint": "https://search.invalid/",
+            "search_api_key": "key",
+            "index_name": "index",
+            "search_upload_batch_size": 100,
+            "search_ready_timeout": 1,
+        }
+        with mock.patch.dict(cfg.__dict__, settings), \
+                mock.patch.object(script_search.index_mgmt, "ensure_index"), \
+                mock.patch.object(script_search, "http_transport"), \
+                mock.patch.object(script_search, "get_search_client", return_value=search_client), \
+                mock.patch.object(script_search, "SearchIndexingBufferedSender",
+                                  side_effect=lambda *args, **kwargs: fakes.FakeBufferedSender(search_client, **kwargs)):
+
+            def index(texts):
+                self.repository.save_json_script({"id": "99", "content": [
+                    {"id": idx + 1, "text": text, "embeddings": vector}
+                    for idx, (text, vector) in enumerate(zip(texts, fake_embeddings(texts)))
+                ]})
+                uploads.clear()
+                script_search.init_script_search(self.repository)
+                return list(uploads)
+
+            texts = [f"paragraph {idx}" for idx in range(5)]
+            self.assertEqual(index(texts), [(["99_1", "99_2", "99_3", "99_4", "99_5"], [])])
+
+            texts[1] = "edited paragraph"
+            self.assertEqual(index(texts), [(["99_2"], [])])
+            self.assertEqual(index(texts[:-1]), [([], ["99_5"])])
+            self.assertEqual(index(texts[:-1]), [])
+
+        self.assertEqual(search_client.documents["99_2"]["text"], "edited paragraph")
+        self.assertEqual(len(search_client.documents), 4)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
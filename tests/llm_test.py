@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import httpx
+import openai
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from disk_cache import DiskCache
+from llm import CachedChatModel, _retry_after
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_rate_limit_uses_requested_delay(self):
+        self.assertEqual(_retry_after(StatusError(429, {"retry-after-ms": "1500"})), 1.5)
+        self.assertEqual(_retry_after(StatusError(429, {"retry-after": "2"})), 2.0)
+        self.assertEqual(_retry_after(StatusError(429)), 0.0)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        for status_code in (408, 409, 500, 502, 503):
+            self.assertEqual(_retry_after(StatusError(status_code)), 0.0)
+        request = httpx.Request("POST", "https://example.invalid/chat/completions")
+        self.assertEqual(_retry_after(openai.APIConnectionError(request=request)), 0.0)
+        self.assertEqual(_retry_after(openai.APITimeoutError(request=request)), 0.0)
+
+    def test_other_errors_are_raised(self):
+        self.assertIsNone(_retry_after(StatusError(400)))
+        self.assertIsNone(_retry_after(StatusError(401)))
+        self.assertIsNone(_retry_after(ValueError("bad request")))
+
+
+class CountingChatModel:
+    def __init__(self):
+        self.requests = 0
+
+    def invoke(self, messages):
+        self.requests += 1
+        return AIMessage(content=f"answer {self.requests}")
+
+
+class CachedChatModelTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = DiskCache(os.path.join(self.test_dir, "responses.sqlite"), max_bytes=1024 * 1024)
+        self.model = CountingChatModel()
+        self.messages = [SystemMessage(content="system"), HumanMessage(content="question")]
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def cached_model(self, deployment="gpt-4o", temperature=0.0, bypass=False, cache=None):
+        return CachedChatModel(self.model, cache or self.cache, deployment=deployment, temperature=temperature,
+                               bypass=bypass)
+
+    def test_hit_skips_model(self):
+        cached_model = self.cached_model()
+
+        self.assertEqual(cached_model.invoke(self.messages).content, "answer 1")
+        self.assertEqual(cached_model.invoke(self.messages).content, "answer 1")
+        self.assertEqual(self.model.requests, 1)
+
+    def test_key_depends_on_request(self):
+        key = self.cached_model()._cache_key(self.messages)
+
+        self.assertEqual(self.cached_model()._cache_key(list(self.messages)), key)
+        self.assertNotEqual(self.cached_model(deployment="gpt-4o-mini")._cache_key(self.messages), key)
+        self.assertNotEqual(self.cached_model(temperature=0.5)._cache_key(self.messages), key)
+        self.assertNotEqual(
+            self.cached_model()._cache_key([SystemMessage(content="other system"), self.messages[1]]), key
+        )
+        self.assertNotEqual(
+            self.cached_model()._cache_key([self.messages[0], HumanMessage(content="other question")]), key
+        )
+
+    def test_bypass_refreshes_stored_response(self):
+        self.cached_model().invoke(self.messages)
+
+        self.assertEqual(self.cached_model(bypass=True).invoke(self.messages).content, "answer 2")
+        self.assertEqual(self.cached_model().invoke(self.messages).content, "answer 2")
+        self.assertEqual(self.model.requests, 2)
+
+    def test_evicts_least_recently_used_responses(self):
+        small_cache = DiskCache(os.path.join(self.test_dir, "small.sqlite"), max_bytes=60)
+        try:
+            cached_model = self.cached_model(cache=small_cache)
+            requests = [[self.messages[0], HumanMessage(content=f"question {idx}")] for idx in range(4)]
+            for messages in requests:
+                cached_model.invoke(messages)
+
+            self.assertEqual(small_cache.stats()["evictions"], 2)
+            cached_model.invoke(requests[0])
+            cached_model.invoke(requests[3])
+            self.assertEqual(self.model.requests, 5)
+        finally:
+            small_cache.close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+import config as cfg
+from main import matching_backend, select_stages
+
+
+class SelectStagesTest(unittest.TestCase):
+
+    def stage_names(self, **settings):
+        with mock.patch.dict(cfg.__dict__, settings):
+            return [stage.name for stage in select_stages()], matching_backend()
+
+    def test_global_alignment_skips_search_index(self):
+        self.assertEqual(
+            self.stage_names(slide_alignment="global", matching_backend="azure"),
+            (["lector", "interpret", "match", "generate"], "local"),
+        )
+
+    def test_matches_alignment_uses_configured_backend(self):
+        self.assertEqual(
+            self.stage_names(slide_alignment="matches", matching_backend="azure"),
+            (["lector", "interpret", "index", "match", "generate"], "azure"),
+        )
+        self.assertEqual(
+            self.stage_names(slide_alignment="matches", matching_backend="local"),
+            (["lector", "interpret", "match", "generate"], "local"),
+        )
+
+    def test_named_stages_are_kept(self):
+        with mock.patch.dict(cfg.__dict__, {"slide_alignment": "global", "matching_backend": "azure"}):
+            self.assertEqual([stage.name for stage in select_stages(["index", "match"])], ["index", "match"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+from rate_limiter import RateLimiter, TokenBucket, create_shared_state
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TooManyRequests(Exception):
+    status_code = 429
+
+
+class ServiceUnavailable(Exception):
+    status_code = 503
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_waits_for_deficit_to_refill(self):
+        bucket = TokenBucket(60, now=0.0, burst_seconds=2)
+
+        self.assertEqual(bucket.reserve(2, now=0.0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1, now=0.0), 1.0)
+        self.assertAlmostEqual(bucket.reserve(1, now=0.5), 1.5)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_paces_requests_per_minute(self):
+        limiter = RateLimiter(requests_per_minute=60, clock=self.clock, sleep=self.clock.sleep)
+
+        for _ in range(12):
+            limiter.acquire(0)
+
+        self.assertAlmostEqual(self.clock.now, 2.0)
+        self.assertEqual(limiter.stats()["throttled_requests"], 2)
+
+    def test_paces_tokens_per_minute(self):
+        limiter = RateLimiter(tokens_per_minute=600, clock=self.clock, sleep=self.clock.sleep)
+
+        limiter.acquire(100)
+        limiter.acquire(100)
+
+        self.assertAlmostEqual(self.clock.now, 10.0)
+
+    def test_retries_after_requested_delay(self):
+        limiter = RateLimiter(clock=self.clock, sleep=self.clock.sleep)
+        responses = [TooManyRequests(), TooManyRequests(), "ok"]
+
+        def send():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        def retry_after(error):
+            return 3.0 if isinstance(error, TooManyRequests) else None
+
+        self.assertEqual(limiter.call(send, 1, retry_after), "ok")
+        self.assertAlmostEqual(self.clock.now, 6.0)
+        self.assertEqual(limiter.stats()["retries"], 2)
+        self.assertEqual(limiter.stats()["rate_limited"], 2)
+        self.assertAlmostEqual(limiter.stats()["throttled_seconds"], 6.0)
+
+    def test_counts_server_errors_apart_and_refunds_tokens(self):
+        limiter = RateLimiter(tokens_per_minute=600, clock=self.clock, sleep=self.clock.sleep)
+        responses = [ServiceUnavailable(), "ok"]
+
+        def send():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        self.assertEqual(limiter.call(send, 100, lambda error: 0.0), "ok")
+        # Only the exponential backoff is waited for, the failed attempt's tokens were returned
+        self.assertAlmostEqual(self.clock.now, 1.0)
+        self.assertEqual(limiter.stats()["failed_attempts"], 1)
+        self.assertEqual(limiter.stats()["rate_limited"], 0)
+        self.assertEqual(limiter.stats()["retries"], 1)
+
+    def test_raises_other_errors_and_exhausted_retries(self):
+        limiter = RateLimiter(max_retries=1, clock=self.clock, sleep=self.clock.sleep)
+
+        def fail():
+            raise TooManyRequests()
+
+        with self.assertRaises(TooManyRequests):
+            limiter.call(fail, 1, lambda error: None)
+        with self.assertRaises(TooManyRequests):
+            limiter.call(fail, 1, lambda error: 0.0)
+        self.assertEqual(limiter.stats()["retries"], 1)
+
+
+    def test_limiters_with_shared_state_draw_from_one_budget(self):
+        shared_state = create_shared_state()
+        first, second = [
+            RateLimiter(requests_per_minute=60, clock=self.clock, sleep=self.clock.sleep, shared_state=shared_state)
+            for _ in range(2)
+        ]
+
+        for _ in range(10):
+            first.acquire(0)
+        self.assertEqual(self.clock.now, 0.0)
+        second.acquire(0)
+        self.assertAlmostEqual(self.clock.now, 1.0)
+
+        second.back_off(5.0)
+        first.acquire(0)
+        self.assertAlmostEqual(self.clock.now, 6.0)
+        self.assertEqual(first.stats()["requests"], 11)
+        self.assertEqual(second.stats()["requests"], 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
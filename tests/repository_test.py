@@ -1,8 +1,10 @@
+import hashlib
 import unittest
+import json
 import os
 import shutil
 import tempfile
-from repository import Repository
+from repository import Repository, fingerprint_file
 
 class TestRepository(unittest.TestCase):
 
@@ -40,5 +42,92 @@ class TestRepository(unittest.TestCase):
         expected_script_file = os.path.join(self.expected_output_folder, 'test.adoc')
         self.assertEqual(repo.get_script_file(), expected_script_file)
 
+    def test_embeddings_are_stored_in_sidecar(self):
+        repo = Repository(self.test_dir)
+        repo.save_json_script({
+            "id": "99",
+            "content": [
+                {"id": 1, "text": "first", "embeddings": [1.0, 0.0]},
+                {"id": 2, "text": "second", "embeddings": [0.0, 1.0]},
+            ]
+        })
+
+        script = repo.read_json_script()
+        self.assertNotIn("embeddings", script["content"][0])
+        self.assertEqual(script["content"][1]["embeddings_ref"], {"file": "script_embeddings.npy", "row": 1})
+        self.assertTrue(os.path.exists(os.path.join(self.expected_output_folder, "script_embeddings.npy")))
+        self.assertEqual(repo.read_script_embeddings().tolist(), [[1.0, 0.0], [0.0, 1.0]])
+
+    def test_reads_inline_embeddings(self):
+        repo = Repository(self.test_dir)
+        descriptions = [{"slide_file": "page_001.png", "description": "slide", "embeddings": [0.5, 0.25]}]
+        with open(os.path.join(self.expected_output_folder, "slide_descriptions.json"), "w", encoding="utf-8") as f:
+            json.dump(descriptions, f)
+
+        self.assertEqual(repo.read_slide_embeddings().tolist(), [[0.5, 0.25]])
+
+        repo.save_slide_descriptions(repo.read_slide_descriptions())
+        self.assertNotIn("embeddings", repo.read_slide_descriptions()[0])
+        self.assertEqual(repo.read_slide_embeddings().tolist(), [[0.5, 0.25]])
+
+    def test_fingerprints_are_recorded_per_stage(self):
+        repo = Repository(self.test_dir)
+        self.assertIsNone(repo.read_fingerprints("interpret"))
+
+        repo.save_fingerprints("interpret", {"page_001.png": "a"})
+        repo.save_fingerprints("match", {"page_001.png": "b"})
+
+        self.assertEqual(repo.read_fingerprints("interpret"), {"page_001.png": "a"})
+        self.assertEqual(repo.read_fingerprints("match", adopt={"page_001.png": "c"}), {"page_001.png": "b"})
+
+    def test_adopts_fingerprints_of_existing_outputs(self):
+        repo = Repository(self.test_dir)
+
+        self.assertEqual(repo.read_fingerprints("script", adopt={"script": "a"}), {"script": "a"})
+        self.assertEqual(repo.read_fingerprints("script"), {"script": "a"})
+
+    def test_journal_keeps_completed_items(self):
+        repo = Repository(self.test_dir)
+        self.assertEqual(repo.read_journal("interpret"), {})
+
+        repo.append_journal("interpret", "page_001.png", "a", "first")
+        repo.append_journal("interpret", "page_002.png", "b", "second")
+        repo.append_journal("interpret", "page_001.png", "c", "first again")
+        with open(os.path.join(self.expected_output_folder, "journal", "interpret.jsonl"), "a", encoding="utf-8") as f:
+            f.write('{"key": "page_003.png", "finger')
+        repo.append_journal("interpret", "page_004.png", "d", "fourth")
+
+        self.assertEqual(repo.read_journal("interpret"), {
+            "page_001.png": ("c", "first again"),
+            "page_002.png": ("b", "second"),
+            "page_004.png": ("d", "fourth"),
+        })
+        self.assertEqual(repo.read_journal("lector"), {})
+
+        repo.clear_journal("interpret")
+        self.assertEqual(repo.read_journal("interpret"), {})
+
+    def test_failed_write_keeps_previous_file(self):
+        repo = Repository(self.test_dir)
+        repo.save_slide_matches([{"slide": 1}])
+
+        with self.assertRaises(TypeError):
+            repo.save_slide_matches([{"slide": object()}])
+
+        self.assertEqual(repo.read_slide_matches(), [{"slide": 1}])
+        self.assertEqual([name for name in os.listdir(self.expected_output_folder) if name.endswith(".tmp")], [])
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_fingerprint_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b"content")
+        try:
+            self.assertEqual(fingerprint_file(f.name), fingerprint_file(f.name))
+            self.assertEqual(fingerprint_file(f.name), hashlib.sha256(b"content").hexdigest())
+        finally:
+            os.remove(f.name)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from scheduler import Stage, run_stages, stage_dependencies
+
+
+def pipeline(run):
+    return [
+        Stage("lector", run, inputs=["transcript"], outputs=["script"]),
+        Stage("interpret", run, inputs=["slide_deck"], outputs=["slide_descriptions"]),
+        Stage("index", run, inputs=["script"], outputs=["search_index"]),
+        Stage("match", run, inputs=["script", "slide_descriptions", "search_index"], outputs=["slide_matches"]),
+    ]
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_dependencies_follow_inputs_and_outputs(self):
+        dependencies = stage_dependencies(pipeline(None))
+        self.assertEqual(dependencies["lector"], set())
+        self.assertEqual(dependencies["interpret"], set())
+        self.assertEqual(dependencies["index"], {"lector"})
+        self.assertEqual(dependencies["match"], {"lector", "interpret", "index"})
+
+    def test_missing_producers_are_treated_as_existing_inputs(self):
+        stages = [stage for stage in pipeline(None) if stage.name in ("index", "match")]
+        self.assertEqual(stage_dependencies(stages), {"index": set(), "match": {"index"}})
+
+    def test_independent_stages_run_concurrently(self):
+        both_started = threading.Barrier(2, timeout=5)
+        order = []
+        lock = threading.Lock()
+
+        def run_stage(stage):
+            if stage.name in ("lector", "interpret"):
+                # Fails with BrokenBarrierError unless both stages run at the same time
+                both_started.wait()
+            with lock:
+                order.append(stage.name)
+
+        run_stages(pipeline(None), run_stage, max_workers=2)
+        self.assertEqual(set(order[:2]), {"lector", "interpret"})
+        self.assertEqual(order[2:], ["index", "match"])
+
+    def test_sequential_run_keeps_dependency_order(self):
+        order = []
+        run_stages(pipeline(None), lambda stage: order.append(stage.name), max_workers=1)
+        self.assertEqual(order, ["lector", "interpret", "index", "match"])
+
+    def test_failure_stops_downstream_stages(self):
+        order = []
+
+        def run_stage(stage):
+            if stage.name == "lector":
+                raise RuntimeError("lector failed")
+            order.append(stage.name)
+
+        with self.assertRaisesRegex(RuntimeError, "lector failed"):
+            run_stages(pipeline(None), run_stage, max_workers=2)
+        self.assertNotIn("index", order)
+        self.assertNotIn("match", order)
+
+    def test_circular_dependencies_are_reported(self):
+        stages = [
+            Stage("a", None, inputs=["y"], outputs=["x"]),
+            Stage("b", None, inputs=["x"], outputs=["y"]),
+        ]
+        with self.assertRaisesRegex(ValueError, "circular"):
+            run_stages(stages, lambda stage: None)
+
+
+if __name__ == "__main__":
+    unittest.main()
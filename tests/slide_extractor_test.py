@@ -0,0 +1,18 @@
+import unittest
+
+from interpreting.slide_extractor import group_pages
+
+
+class GroupPagesTest(unittest.TestCase):
+    def test_groups_consecutive_pages(self):
+        self.assertEqual(group_pages([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+
+    def test_splits_at_gaps(self):
+        self.assertEqual(group_pages([1, 2, 5, 6, 7, 9], 4), [[1, 2], [5, 6, 7], [9]])
+
+    def test_no_pages(self):
+        self.assertEqual(group_pages([], 4), [])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,84 @@
+import base64
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image, ImageDraw
+
+from interpreting.slide_images import encode_slide_image, find_duplicates, hash_distance, perceptual_hash
+
+
+class EncodeSlideImageTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.slide_file = tempfile.mkstemp(suffix=".png")
+        os.close(handle)
+        Image.new("RGBA", (2000, 1125), (255, 0, 0, 0)).save(self.slide_file, "PNG")
+
+    def tearDown(self):
+        os.remove(self.slide_file)
+
+    def decode(self, data_url):
+        header, encoded_content = data_url.split(",", 1)
+        return header, Image.open(io.BytesIO(base64.b64decode(encoded_content)))
+
+    def test_scales_down_and_encodes_as_jpeg(self):
+        header, image = self.decode(encode_slide_image(self.slide_file, max_edge=1000))
+
+        self.assertEqual(header, "data:image/jpeg;base64")
+        self.assertEqual(image.format, "JPEG")
+        self.assertEqual(image.size, (1000, 562))
+        # Transparent areas are placed on white instead of black
+        self.assertEqual(image.getpixel((10, 10)), (255, 255, 255))
+
+    def test_keeps_size_and_format(self):
+        header, image = self.decode(encode_slide_image(self.slide_file, max_edge=0, image_format="png"))
+
+        self.assertEqual(header, "data:image/png;base64")
+        self.assertEqual(image.size, (2000, 1125))
+        self.assertEqual(Image.open(self.slide_file).size, (2000, 1125))
+
+    def test_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            encode_slide_image(self.slide_file, image_format="gif")
+
+
+class PerceptualHashTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for filename in os.listdir(self.folder):
+            os.remove(os.path.join(self.folder, filename))
+        os.rmdir(self.folder)
+
+    def slide(self, name, boxes, size=(1600, 900)):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for box in boxes:
+            draw.rectangle(box, fill="black")
+        slide_file = os.path.join(self.folder, name)
+        image.save(slide_file, "PNG")
+        return slide_file
+
+    def test_similar_slides_have_close_hashes(self):
+        title = (100, 80, 1400, 200)
+        original = perceptual_hash(self.slide("a.png", [title, (100, 300, 800, 700)]))
+        resized = perceptual_hash(self.slide("b.png", [(50, 40, 700, 100), (50, 150, 400, 350)], size=(800, 450)))
+        different = perceptual_hash(self.slide("c.png", [(900, 100, 1500, 800)]))
+
+        self.assertEqual(len(original), 64)
+        self.assertLessEqual(hash_distance(original, resized), 4)
+        self.assertGreater(hash_distance(original, different), 32)
+
+    def test_find_duplicates(self):
+        slide_hashes = {"a": "00", "b": "01", "c": "ff", "d": "03"}
+
+        self.assertEqual(find_duplicates(slide_hashes, 1), {"b": "a"})
+        self.assertEqual(find_duplicates(slide_hashes, 2), {"b": "a", "d": "a"})
+        self.assertEqual(find_duplicates(slide_hashes, 2, candidates=["a", "d"]), {"d": "b"})
+        self.assertEqual(find_duplicates(slide_hashes, 0), {})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
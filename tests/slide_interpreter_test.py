@@ -0,0 +1,52 @@
+import json
+import unittest
+from unittest import mock
+
+from langchain_core.messages import AIMessage, SystemMessage
+
+from interpreting import slide_interpreter
+from interpreting.slide_interpreter import parse_batch_response
+
+
+class ParseBatchResponseTest(unittest.TestCase):
+    def test_parses_slides_object(self):
+        response = '```json\n{"slides": [{"slide": 1, "description": " first "}, {"slide": 2, "description": "second"}]}\n```'
+        self.assertEqual(parse_batch_response(response, 2), {1: "first", 2: "second"})
+
+    def test_skips_malformed_entries(self):
+        response = json.dumps([
+            {"slide": 1, "description": ""},
+            {"slide": 2, "description": "second"},
+            {"slide": 5, "description": "out of range"},
+            "third",
+        ])
+        self.assertEqual(parse_batch_response(response, 3), {2: "second"})
+
+    def test_invalid_json(self):
+        self.assertEqual(parse_batch_response("Slide 1 shows {an architecture", 1), {})
+        self.assertEqual(parse_batch_response("no json at all", 1), {})
+
+
+class InterpretSlideBatchTest(unittest.TestCase):
+    def test_falls_back_to_single_requests_for_missing_slides(self):
+        responses = [
+            AIMessage(content='{"slides": [{"slide": 1, "description": "first"}]}'),
+            AIMessage(content="second alone"),
+        ]
+        client = mock.Mock()
+        client.invoke.side_effect = responses
+        image = {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,"}}
+
+        with mock.patch.object(slide_interpreter, "_image_content", return_value=image):
+            descriptions = slide_interpreter._interpret_slide_batch(
+                client, SystemMessage(content="system"), "batch", ["page_001.png", "page_002.png"]
+            )
+
+        self.assertEqual(descriptions, ["first", "second alone"])
+        self.assertEqual(client.invoke.call_count, 2)
+        batch_content = client.invoke.call_args_list[0].args[0][1].content
+        self.assertEqual([item["type"] for item in batch_content], ["text", "text", "image_url", "text", "image_url"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
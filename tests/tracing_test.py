@@ -0,0 +1,107 @@
+import json
+import threading
+import unittest
+
+import tracing
+from concurrency import map_ordered
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(tracing.percentile(values, 50), 50.0)
+        self.assertEqual(tracing.percentile(values, 99), 99.0)
+        self.assertEqual(tracing.percentile([3.0], 90), 3.0)
+
+    def test_empty(self):
+        self.assertIsNone(tracing.percentile([], 50))
+
+
+class TestTrace(unittest.TestCase):
+
+    def tearDown(self):
+        tracing._active_trace = None
+
+    def test_records_stage_wall_time(self):
+        clock = FakeClock()
+        trace = tracing.Trace("01", clock=clock)
+        with trace.stage("lector"):
+            clock.now = 2.5
+        self.assertEqual(trace.to_dict()["stages"], [{"stage": "lector", "seconds": 2.5, "calls": {}}])
+
+    def test_attributes_calls_to_current_stage(self):
+        trace = tracing.start_trace("01")
+        with trace.stage("interpret"):
+            tracing.record_call("chat:gpt-4o", 1.0, prompt_tokens=100, completion_tokens=20)
+            tracing.record_call("chat:gpt-4o", 3.0, prompt_tokens=50, completion_tokens=10, retries=2)
+            tracing.record_cache_hits("chat:gpt-4o", 4)
+        with trace.stage("match"):
+            tracing.record_call("search:query", 0.5, failed=True)
+
+        stages = {stage["stage"]: stage["calls"] for stage in trace.to_dict()["stages"]}
+        chat = stages["interpret"]["chat:gpt-4o"]
+        self.assertEqual(chat["requests"], 2)
+        self.assertEqual(chat["cache_hits"], 4)
+        self.assertEqual(chat["prompt_tokens"], 150)
+        self.assertEqual(chat["completion_tokens"], 30)
+        self.assertEqual(chat["retries"], 2)
+        self.assertEqual(chat["p50"], 1.0)
+        self.assertEqual(chat["p99"], 3.0)
+        self.assertEqual(stages["match"]["search:query"]["errors"], 1)
+
+    def test_stage_is_visible_in_worker_threads(self):
+        trace = tracing.start_trace()
+        thread_names = set()
+
+        def call(item):
+            thread_names.add(threading.current_thread().name)
+            tracing.record_call("embeddings", 0.1)
+            return item
+
+        with trace.stage("lector"):
+            map_ordered(call, range(8), max_workers=4)
+
+        self.assertNotIn(threading.main_thread().name, thread_names)
+        self.assertEqual(trace.to_dict()["stages"][0]["calls"]["embeddings"]["requests"], 8)
+
+    def test_timed_call_marks_failures(self):
+        trace = tracing.start_trace()
+        with self.assertRaises(RuntimeError):
+            with tracing.timed_call("search:upload"):
+                raise RuntimeError("boom")
+        calls = trace.to_dict()["stages"][0]["calls"]
+        self.assertEqual(calls["search:upload"]["errors"], 1)
+
+    def test_recording_without_trace_is_ignored(self):
+        tracing.record_call("chat", 1.0)
+        tracing.record_cache_hits("chat")
+
+    def test_trace_and_summary_are_serializable(self):
+        trace = tracing.start_trace("01")
+        with trace.stage("lector"):
+            tracing.record_call("chat:gpt-4o", 1.0)
+        json.dumps(trace.to_dict())
+        summary = trace.format_summary().splitlines()
+        self.assertTrue(summary[0].startswith("stage"))
+        self.assertTrue(summary[1].startswith("lector"))
+        self.assertIn("chat:gpt-4o", summary[2])
+
+    def test_cache_stats_are_reported(self):
+        trace = tracing.Trace("01")
+        trace.record_cache_stats("embeddings", {"hits": 3, "misses": 1, "evictions": 0})
+
+        self.assertEqual(trace.to_dict()["caches"], {"embeddings": {"hits": 3, "misses": 1, "evictions": 0}})
+        self.assertEqual(trace.format_summary().splitlines()[-1], "embeddings cache: 3 hits, 1 misses, 0 evictions")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from matching.vector_index import VectorIndex
+
+
+class VectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        script = {
+            "id": "01",
+            "content": [
+                {"id": 1, "text": "first"},
+                {"id": 2, "text": "second"},
+                {"id": 3, "text": "third"},
+            ],
+        }
+        vectors = [[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0]]
+        self.index = VectorIndex.from_script(script, vectors)
+
+    def test_returns_top_k_in_descending_score_order(self):
+        results = self.index.search([[0.1, 1.0, 0.5]], k=2)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual([r["paragraph_id"] for r in results[0]], ["2", "3"])
+        self.assertGreater(results[0][0]["score"], results[0][1]["score"])
+        self.assertEqual(results[0][0]["file_id"], "01")
+        self.assertEqual(results[0][0]["text"], "second")
+
+    def test_uses_search_service_score_convention(self):
+        results = self.index.search([[1.0, 0.0, 0.0]], k=1)
+        self.assertAlmostEqual(results[0][0]["score"], 1.0, places=6)
+
+        results = self.index.search([[0.0, 1.0, 1.0]], k=3)
+        self.assertAlmostEqual(results[0][2]["score"], 0.5, places=6)
+
+    def test_k_larger_than_index(self):
+        results = self.index.search([[1.0, 1.0, 1.0], [0.0, 0.0, 1.0]], k=10)
+        self.assertEqual([len(r) for r in results], [3, 3])
+        self.assertEqual(results[1][0]["paragraph_id"], "3")
+
+    def test_no_queries(self):
+        self.assertEqual(self.index.search([], k=3), [])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
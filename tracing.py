@@ -0,0 +1,186 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+PERCENTILES = (50, 90, 99)
+
+_current_stage = contextvars.ContextVar("tracing_stage", default=None)
+_active_trace = None
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class CallStats:
+    """Statistics of the calls one stage made to one external service."""
+
+    def __init__(self):
+        self.latencies = []
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            "requests": len(self.latencies),
+            "cache_hits": self.cache_hits,
+            "seconds": round(sum(self.latencies), 3),
+            **{f"p{percent}": _round(percentile(self.latencies, percent)) for percent in PERCENTILES},
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "errors": self.errors,
+        }
+
+
+class Trace:
+    """Collects the wall time of pipeline stages and the external calls made in them.
+
+    Calls are attributed to the stage that is active in the calling context;
+    map_ordered carries the stage over into its worker threads.
+    """
+
+    def __init__(self, name=None, clock=time.perf_counter):
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.calls = {}
+        self.caches = {}
+
+    @contextmanager
+    def stage(self, stage_name):
+        token = _current_stage.set(stage_name)
+        with self._lock:
+            # Stages are listed in the order they started
+            self.stages.setdefault(stage_name, 0.0)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - started
+            _current_stage.reset(token)
+            with self._lock:
+                self.stages[stage_name] = self.stages.get(stage_name, 0.0) + elapsed
+
+    def record_call(self, service, seconds, *, prompt_tokens=0, completion_tokens=0, retries=0, failed=False):
+        with self._lock:
+            stats = self._stats(service)
+            stats.latencies.append(seconds)
+            stats.prompt_tokens += prompt_tokens or 0
+            stats.completion_tokens += completion_tokens or 0
+            stats.retries += retries
+            stats.errors += 1 if failed else 0
+
+    def record_cache_hits(self, service, count=1):
+        with self._lock:
+            self._stats(service).cache_hits += count
+
+    def record_cache_stats(self, cache_name, stats):
+        """Record the hit, miss and eviction counts of a local cache during the traced run."""
+        with self._lock:
+            self.caches[cache_name] = dict(stats)
+
+    def to_dict(self):
+        with self._lock:
+            stage_names = list(self.stages) + [
+                stage for stage, _ in self.calls if stage not in self.stages
+            ]
+            return {
+                "name": self.name,
+                "stages": [
+                    {
+                        "stage": stage,
+                        "seconds": _round(self.stages.get(stage)),
+                        "calls": {
+                            service: stats.to_dict()
+                            for (call_stage, service), stats in self.calls.items()
+                            if call_stage == stage
+                        },
+                    }
+                    for stage in dict.fromkeys(stage_names)
+                ],
+                "caches": dict(self.caches),
+            }
+
+    def format_summary(self):
+        """Return a table with one line per stage and one line per service called in it."""
+        header = ["stage", "wall", "service", "requests", "cached"] + [f"p{percent}" for percent in PERCENTILES] + [
+            "prompt", "completion", "retries", "errors"
+        ]
+        rows = []
+        for stage in self.to_dict()["stages"]:
+            wall = f"{stage['seconds']:.1f}s" if stage["seconds"] is not None else "-"
+            rows.append([stage["stage"] or "-", wall] + ["-"] * (len(header) - 2))
+            for service, stats in stage["calls"].items():
+                rows.append(
+                    ["", "", service, str(stats["requests"]), str(stats["cache_hits"])]
+                    + [f"{stats[f'p{percent}']:.2f}s" if stats[f"p{percent}"] is not None else "-"
+                       for percent in PERCENTILES]
+                    + [str(stats["prompt_tokens"]), str(stats["completion_tokens"]),
+                       str(stats["retries"]), str(stats["errors"])]
+                )
+        widths = [max(len(row[idx]) for row in [header] + rows) for idx in range(len(header))]
+        lines = [
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+            for row in [header] + rows
+        ]
+        for cache_name, stats in self.to_dict()["caches"].items():
+            lines.append(f"{cache_name} cache: {stats['hits']} hits, {stats['misses']} misses, "
+                         f"{stats['evictions']} evictions")
+        return "\n".join(lines)
+
+    def _stats(self, service):
+        key = (_current_stage.get(), service)
+        if key not in self.calls:
+            self.calls[key] = CallStats()
+        return self.calls[key]
+
+
+def start_trace(name=None):
+    """Start collecting a new trace; calls recorded afterwards are added to it."""
+    global _active_trace
+    _active_trace = Trace(name)
+    return _active_trace
+
+
+def get_trace():
+    return _active_trace
+
+
+def record_call(service, seconds, **details):
+    """Record one request to an external service in the active trace, if any."""
+    if _active_trace is not None:
+        _active_trace.record_call(service, seconds, **details)
+
+
+def record_cache_hits(service, count=1):
+    """Record requests to an external service that were answered from a cache."""
+    if _active_trace is not None and count:
+        _active_trace.record_cache_hits(service, count)
+
+
+@contextmanager
+def timed_call(service, **details):
+    """Record the duration of the enclosed request, marking it failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield details
+    except BaseException:
+        record_call(service, time.perf_counter() - started, failed=True, **details)
+        raise
+    record_call(service, time.perf_counter() - started, **details)
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None